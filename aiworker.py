@@ -0,0 +1,78 @@
+"""
+AI turns in a background thread.
+
+The window has to keep drawing and reading events while the computer
+thinks, so AITurn runs player.take_turn() on a daemon thread and hands the
+result back when the main loop asks for it.  The player gets a Budget it
+can check while searching: it runs out at the deadline, or at once if the
+turn is cancelled (e.g. the window is closed).
+"""
+import threading
+import time
+
+import instrument
+
+
+class Budget():
+    def __init__(self, seconds=None):
+        # no deadline when seconds is None; cancel() still stops the turn
+        self.deadline = None if seconds is None else time.perf_counter() + seconds
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def remaining(self):
+        if (self.cancelled.is_set()):
+            return 0.0
+        if (self.deadline is None):
+            return float("inf")
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def expired(self):
+        return self.cancelled.is_set() or (self.deadline is not None and time.perf_counter() >= self.deadline)
+
+
+class AITurn():
+    # one turn of an AI player; notify() is called from the worker thread
+    # when the turn is over, e.g. to post an event that wakes the main loop
+    def __init__(self, player, closedeck, opendeck, seconds=None, notify=None):
+        self.player = player
+        self.budget = Budget(seconds)
+        self.notify = notify
+        self.result = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(closedeck, opendeck),
+                                       name="ai-" + player.name, daemon=True)
+        self.thread.start()
+
+    def _run(self, closedeck, opendeck):
+        try:
+            with instrument.profiled("turn"), instrument.timer("ai_turn"):
+                self.result = self.player.take_turn(closedeck, opendeck, self.budget)
+        except BaseException as e:
+            self.error = e
+        self.elapsed = time.perf_counter() - self.started
+        self.finished.set()
+        if (self.notify is not None):
+            self.notify()
+
+    def done(self):
+        return self.finished.is_set()
+
+    def get(self):
+        # the (done, throw_card) of take_turn; errors of the worker are
+        # raised here, on the thread that asks
+        if (not self.finished.is_set()):
+            return None
+        if (self.error is not None):
+            raise self.error
+        return self.result
+
+    def cancel(self, timeout=1.0):
+        # stop thinking and wait a little for the worker to notice
+        self.budget.cancel()
+        self.thread.join(timeout)
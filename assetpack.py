@@ -0,0 +1,71 @@
+"""
+Single-file asset pack for the card and button images.
+
+Decoding a GIF per card is most of the start-up time.  build_pack() decodes
+every image in data/ once and stores the raw RGB pixels back to back in one
+file after a small JSON index; load_pack() reads that file in a single call
+and hands out surfaces that point straight into the buffer.
+
+    python assetpack.py [DATA_DIR] [PACK_FILE]
+"""
+import json
+import os
+import struct
+import sys
+
+import pygame
+
+MAGIC = b"RUMMYPK1"
+PACK_NAME = "assets.pack"
+IMAGE_TYPES = (".gif", ".jpg", ".png", ".bmp")
+
+
+def build_pack(data_dir, path):
+    index = {}
+    chunks = []
+    offset = 0
+    for name in sorted(os.listdir(data_dir)):
+        if (os.path.splitext(name)[1].lower() not in IMAGE_TYPES):
+            continue
+        image = pygame.image.load(os.path.join(data_dir, name))
+        pixels = pygame.image.tobytes(image, "RGB")
+        index[name] = (offset, image.get_width(), image.get_height())
+        chunks.append(pixels)
+        offset += len(pixels)
+    header = json.dumps(index).encode("utf-8")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for pixels in chunks:
+            f.write(pixels)
+    os.replace(tmp, path)
+    return len(index)
+
+
+def load_pack(path):
+    # {name: surface}; the surfaces share the one buffer read from disk
+    with open(path, "rb") as f:
+        data = f.read()
+    if (data[:len(MAGIC)] != MAGIC):
+        raise ValueError("not an asset pack: " + path)
+    size, = struct.unpack_from("<I", data, len(MAGIC))
+    start = len(MAGIC) + 4
+    index = json.loads(data[start:start + size].decode("utf-8"))
+    pixels = memoryview(data)[start + size:]
+    surfaces = {}
+    for name, (offset, w, h) in index.items():
+        surfaces[name] = pygame.image.frombuffer(pixels[offset:offset + w * h * 3], (w, h), "RGB")
+    return surfaces
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    data_dir = argv[0] if argv else os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    path = argv[1] if len(argv) > 1 else os.path.join(data_dir, PACK_NAME)
+    print("packed %d images into %s" % (build_pack(data_dir, path), path))
+
+
+if __name__ == "__main__":
+    main()
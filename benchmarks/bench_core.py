@@ -0,0 +1,105 @@
+"""
+Deal + group throughput of the integer card core versus the old object model.
+
+Both sides do the same work: build and shuffle a double deck, deal two hands
+and split one into runs the way the old Me.make_groups did (the real solver
+is timed by bench_melds.py).  The old model is reproduced here without its
+image loading (one GIF decode per card), so the numbers below understate the
+real difference.
+
+    python benchmarks/bench_core.py [-n DEALS]
+"""
+import argparse
+import operator
+import os
+import random
+import sys
+import time
+from itertools import product
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rummycore import NUM_RANKS, Suit, CardRank, DoubleDeck, card_face
+
+
+class LegacyCard():
+    def __init__(self, s, v):
+        self.suit = s
+        self.rank = v
+
+
+class LegacyDeck():
+    def __init__(self):
+        self.cards = []
+        for i in range(2):
+            for s, v in product(Suit, CardRank):
+                self.cards.append(LegacyCard(s, v))
+
+    def draw_cards(self, n):
+        hand = []
+        i = 0
+        while (i < n):
+            hand.append(self.cards[0])
+            self.cards.pop(0)
+            i += 1
+        return hand
+
+
+def legacy_deal(rng):
+    deck = LegacyDeck()
+    rng.shuffle(deck.cards)
+    me = deck.draw_cards(13)
+    deck.draw_cards(13)
+    me.sort(key=operator.attrgetter("suit", "rank"))
+    groups = []
+    group = []
+    for cur_card in me:
+        if (group and (group[-1].suit != cur_card.suit or cur_card.rank - group[-1].rank != 1)):
+            groups.append(group)
+            group = []
+        group.append(cur_card)
+    groups.append(group)
+    return groups
+
+
+def core_deal(rng):
+    deck = DoubleDeck("cd")
+    deck.shuffle_cards(rng)
+    me = deck.draw_cards(13)
+    deck.draw_cards(13)
+    me.sort(key=card_face)
+    groups = []
+    group = []
+    for cur_card in me:
+        # same suit and next rank is next face, barring the ace wrapping
+        if (group and (card_face(cur_card) - card_face(group[-1]) != 1 or cur_card % NUM_RANKS == 0)):
+            groups.append(group)
+            group = []
+        group.append(cur_card)
+    groups.append(group)
+    return groups
+
+
+def measure(fn, n, seed):
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for i in range(n):
+        fn(rng)
+    return n / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--deals", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    legacy = measure(legacy_deal, args.deals, args.seed)
+    core = measure(core_deal, args.deals, args.seed)
+    print("legacy objects: %10.0f deals/s" % legacy)
+    print("integer core:   %10.0f deals/s" % core)
+    print("speedup:        %10.2fx" % (core / legacy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Deal generation: DoubleDeck one deal at a time versus dealgen batches.
+
+    python benchmarks/bench_deals.py [-n DEALS] [--seed SEED]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dealgen
+from rummycore import DoubleDeck
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--deals", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    n = args.deals
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    for i in range(n):
+        deck = DoubleDeck("cd", rng=rng)
+        deck.shuffle_cards()
+        deck.draw_cards(13)
+        deck.draw_cards(13)
+        deck.draw_cards(2)
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for deals in dealgen.iter_deals(args.seed, n):
+        dealgen.hands(deals, 0)
+        dealgen.hands(deals, 1)
+        dealgen.jokers(deals)
+    batch = time.perf_counter() - start
+
+    print("DoubleDeck:  %10.0f deals/s" % (n / loop))
+    print("dealgen:     %10.0f deals/s" % (n / batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Branching the game state: GameState moves versus deep copies of the table.
+
+    python benchmarks/bench_gamestate.py [-n BRANCHES]
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gamestate import GameState
+from rummycore import Deck, DoubleDeck, Player
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--branches", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    opendeck = Deck("od")
+    closedeck = DoubleDeck("cd", opendeck, rng)
+    closedeck.shuffle_cards()
+    players = [Player(closedeck, "p0"), Player(closedeck, "p1")]
+    jokers = closedeck.draw_cards(2)
+    opendeck.add_card(closedeck.draw_card())
+    state = GameState.from_table(closedeck, opendeck, players, jokers)
+    n = args.branches
+
+    # a branch: copy what is needed to play one turn without touching the original
+    start = time.perf_counter()
+    for i in range(n):
+        table = copy.deepcopy((closedeck.cards, opendeck.cards, [p.cardgroups for p in players]))
+    deep = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        branch = state.draw(i & 1)
+        branch = branch.throw(branch.hands[0][-1][0])
+    moves = time.perf_counter() - start
+
+    print("deepcopy of the table:    %8.2f us" % (deep / n * 1e6))
+    print("GameState draw + throw:   %8.2f us" % (moves / n * 1e6))
+
+
+if __name__ == "__main__":
+    main()
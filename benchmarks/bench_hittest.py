@@ -0,0 +1,90 @@
+"""
+Hand hit-testing: HitIndex versus the old per-click scan over pygame.Rects.
+
+    python benchmarks/bench_hittest.py [--cards N] [--groups G] [-n QUERIES]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hitindex import HitIndex
+
+CARD_W, CARD_H, OFFSET, GAP, TOP = 71, 96, 20, 60, 350
+
+
+def layout(ncards, ngroups):
+    # rects of the cards, split into groups laid out left to right
+    groups = [[] for g in range(ngroups)]
+    for c in range(ncards):
+        groups[c * ngroups // ncards].append(c)
+    rects = []
+    x = 10
+    for g in groups:
+        rs = []
+        for c in g:
+            rs.append(pygame.Rect(x, TOP, CARD_W, CARD_H))
+            x += OFFSET
+        x = rs[-1].right + GAP
+        rects.append(rs)
+    return rects
+
+
+def legacy_hit(groups, pos):
+    # what You.clicked_in_hand used to do on every click
+    for i, g in enumerate(groups):
+        group_rect = pygame.Rect(g[0].x, g[0].y, g[-1].right - g[0].x, g[-1].bottom - g[0].y)
+        if (group_rect.collidepoint(pos)):
+            j = -1
+            for r in g:
+                j += 1
+                if (pygame.Rect(r.x, r.y, OFFSET, r.bottom - r.top).collidepoint(pos)):
+                    break
+            return True, i, j
+    return False, -1, -1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=13)
+    parser.add_argument("--groups", type=int, default=4)
+    parser.add_argument("-n", "--queries", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    groups = layout(args.cards, args.groups)
+    index = HitIndex()
+    for gix, g in enumerate(groups):
+        index.place_group(gix, [r.x for r in g], TOP, CARD_W, CARD_H, OFFSET)
+
+    rng = random.Random(1)
+    width = groups[-1][-1].right + 20
+    points = [(rng.randrange(width), rng.randrange(TOP - 20, TOP + CARD_H + 20)) for i in range(args.queries)]
+
+    for pos in points[:2000]:
+        found, i, j = legacy_hit(groups, pos)
+        assert (index.hit(*pos) == ((i, j) if found else None))
+
+    start = time.perf_counter()
+    for pos in points:
+        legacy_hit(groups, pos)
+    legacy = time.perf_counter() - start
+    start = time.perf_counter()
+    hit = index.hit
+    for x, y in points:
+        hit(x, y)
+    indexed = time.perf_counter() - start
+
+    n = args.queries
+    print("%d cards in %d groups" % (args.cards, args.groups))
+    print("rect scan: %8.2f us/query" % (legacy / n * 1e6))
+    print("HitIndex:  %8.2f us/query" % (indexed / n * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Hand regrouping: HandLayout edits versus laying the whole hand out again.
+
+Each step moves one card to another group, the way a drag will.  The old
+way is what You.make_group did after every grouping: place every card,
+mark it for repainting and rebuild the hit index.
+
+    python benchmarks/bench_layout.py [--cards N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlayout import HandLayout
+
+CARD_W, CARD_H, OFFSET, GAP, TOP = 71, 96, 20, 60, 350
+
+
+class Rect():
+    def __init__(self):
+        self.x = self.y = 0
+        self.width, self.height = CARD_W, CARD_H
+
+
+class Sprite():
+    def __init__(self, card):
+        self.rect = Rect()
+        self.dirty = 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=13)
+    parser.add_argument("--groups", type=int, default=4)
+    parser.add_argument("-n", "--moves", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    cards = list(range(args.cards))
+    groups = [cards[g::args.groups] for g in range(args.groups)]
+    layout = HandLayout(10, TOP, OFFSET, GAP, {c: Sprite(c) for c in cards}, Sprite)
+    layout.reset(groups)
+    moves = []
+    sizes = [len(g) for g in groups]
+    for i in range(args.moves):
+        src = rng.choice([g for g in range(args.groups) if sizes[g] > 1])
+        dst = rng.randrange(args.groups)
+        moves.append((src, rng.randrange(sizes[src]), dst))
+        sizes[src] -= 1
+        sizes[dst] += 1
+
+    start = time.perf_counter()
+    for src, cix, dst in moves:
+        layout.groups[dst].append(layout.groups[src].pop(cix))
+        layout.reset(layout.groups)
+    full = time.perf_counter() - start
+
+    layout.reset([cards[g::args.groups] for g in range(args.groups)])
+    start = time.perf_counter()
+    for src, cix, dst in moves:
+        layout.move(src, cix, dst)
+    edits = time.perf_counter() - start
+
+    # sprites that have to be repainted after a move
+    layout.reset([cards[g::args.groups] for g in range(args.groups)])
+    sprites = list(layout.sprites.values())
+    moved = 0
+    for src, cix, dst in moves[:1000]:
+        for s in sprites:
+            s.dirty = 0
+        layout.move(src, cix, dst)
+        moved += sum(s.dirty for s in sprites)
+
+    n = args.moves
+    print("%d cards in %d groups" % (args.cards, args.groups))
+    print("full relayout: %8.2f us/move, %d sprites repainted" % (full / n * 1e6, args.cards))
+    print("HandLayout:    %8.2f us/move, %.1f sprites repainted" % (edits / n * 1e6, moved / min(n, 1000)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Meld solver latency over a corpus of random deals.
+
+Each deal is made the way main() makes it: shuffle a double deck, deal two
+13 card hands, then turn up two jokers whose ranks are wild.
+
+    python benchmarks/bench_melds.py [-n DEALS] [--seed SEED]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rummycore import DoubleDeck
+from melds import solve_hand, wild_ranks_of
+
+
+def make_corpus(n, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        deck = DoubleDeck("cd")
+        deck.shuffle_cards(rng)
+        hand = deck.draw_cards(13)
+        deck.draw_cards(13)
+        corpus.append((hand, wild_ranks_of(deck.draw_cards(2))))
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--deals", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.deals, args.seed)
+    times = []
+    points = 0
+    valid = 0
+    for hand, wild in corpus:
+        start = time.perf_counter()
+        part = solve_hand(hand, wild)
+        times.append(time.perf_counter() - start)
+        points += part.points
+        valid += part.valid()
+    times.sort()
+    n = len(times)
+    print("hands:      %d (%d declarable, mean deadwood %.1f)" % (n, valid, points / n))
+    print("throughput: %.0f hands/s" % (n / sum(times)))
+    print("latency:    mean %.0f us, p50 %.0f us, p99 %.0f us, max %.0f us" % (
+        sum(times) / n * 1e6, times[n // 2] * 1e6, times[n * 99 // 100] * 1e6, times[-1] * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Batched hand scoring versus a per-hand Python loop.
+
+    python benchmarks/bench_scoring.py [-n HANDS] [--seed SEED]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dealgen
+from handcache import HandCache
+from melds import solve_hand
+from scoring import score_hands
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--hands", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    deals = dealgen.deal_batch(args.seed, args.hands)
+    hands = dealgen.hands(deals)
+    joker_ranks = dealgen.joker_ranks(deals)
+
+    start = time.perf_counter()
+    for hand, jokers in zip(hands.tolist(), joker_ranks.tolist()):
+        solve_hand(hand, tuple(set(jokers)))
+    loop = time.perf_counter() - start
+
+    cache = HandCache()
+    start = time.perf_counter()
+    score_hands(hands, joker_ranks, cache)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    score_hands(hands, joker_ranks, cache)
+    warm = time.perf_counter() - start
+
+    n = args.hands
+    print("python loop:     %10.0f hands/s" % (n / loop))
+    print("batch (cold):    %10.0f hands/s" % (n / cold))
+    print("batch (warm):    %10.0f hands/s" % (n / warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Table size: dealing and per-turn cost from 2 players and 2 decks up to 6 and 3.
+
+Each table plays greedy games on fixed seeds.  "turn ms" is the player's
+own take_turn (the meld solver, mostly); "other us/turn" is the rest of the
+game spread over its turns: the deal and first grouping of every hand, and
+the table's bookkeeping (the throw put on the pile, the turn shown to the
+other seats, the open pile turned over when the closed deck runs out).
+
+    python benchmarks/bench_table.py [-n GAMES]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handcache import shared_cache
+from rummycore import Deck, Player, TableConfig, TableDeck
+from selfplay import play_game
+
+TABLES = ((2, 2, False), (4, 2, False), (6, 2, False), (6, 3, False), (6, 3, True))
+
+
+def deal(config, n):
+    # shuffle and deal n tables, in seconds per table
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for i in range(n):
+        closedeck = TableDeck("cd", config, Deck("od"), rng)
+        closedeck.shuffle_cards()
+        hands = [Player(closedeck, "p", config.hand_size) for p in range(config.players)]
+        closedeck.draw_cards(3)
+    return (time.perf_counter() - start) / n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--games", type=int, default=20)
+    parser.add_argument("--deals", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    print("%-22s %9s %11s %11s %12s" % ("table", "deal us", "turns/game", "turn ms", "other us/turn"))
+    for players, decks, printed in TABLES:
+        config = TableConfig(players, decks, printed)
+        dealt = deal(config, args.deals)
+        shared_cache.clear()
+        turns = 0
+        think = 0.0
+        start = time.perf_counter()
+        for seed in range(args.games):
+            r = play_game(seed, ["greedy"] * players, config=config)
+            turns += r.turns
+            think += sum(r.think)
+        elapsed = time.perf_counter() - start
+        name = "%dp %dd%s" % (players, decks, " +jokers" if printed else "")
+        print("%-22s %9.1f %11.1f %11.3f %12.1f" % (
+            name, dealt * 1e6, turns / args.games, think / turns * 1000,
+            (elapsed - think) / turns * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+The benchmark suite: every hot path timed on fixed seeds, as JSON.
+
+Each case builds its inputs from a fixed seed, runs a few times and keeps
+the best run, so two runs on the same machine measure the same work.  The
+results go to a JSON file together with the commit and the versions they
+were made with; --compare puts a new run beside an old file and fails when
+a metric got worse by more than the threshold.
+
+    python benchmarks/suite.py --out base.json
+    (change things, or check out another commit)
+    python benchmarks/suite.py --compare base.json
+
+Rendering runs on SDL's dummy video driver unless SDL_VIDEODRIVER is set,
+so the suite also runs without a display.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import dealgen
+from handcache import HandCache, shared_cache
+from melds import solve_hand, wild_ranks_of
+from rummycore import Deck, DoubleDeck, Me, TableConfig
+
+SEED = 1
+CASES = []
+
+
+def case(name):
+    def register(f):
+        CASES.append((name, f))
+        return f
+    return register
+
+
+def best_of(repeat, f):
+    # the fastest of repeat runs of f(), in seconds
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def rate(value, unit):
+    return {"value": value, "unit": unit, "better": "higher"}
+
+
+def latency(value, unit):
+    return {"value": value, "unit": unit, "better": "lower"}
+
+
+def percentile(times, p):
+    times = sorted(times)
+    return times[min(len(times) - 1, len(times) * p // 100)]
+
+
+@case("deal")
+def bench_deal(scale, repeat):
+    n = int(20000 * scale)
+
+    def deal_loop():
+        rng = random.Random(SEED)
+        for i in range(n):
+            deck = DoubleDeck("cd", None, rng)
+            deck.shuffle_cards()
+            deck.draw_cards(13)
+            deck.draw_cards(13)
+            deck.draw_cards(2)
+
+    loop = best_of(repeat, deal_loop)
+    batch = best_of(repeat, lambda: dealgen.deal_batch(SEED, n * 10))
+    return {"doubledeck": rate(n / loop, "deals/s"),
+            "dealgen": rate(n * 10 / batch, "deals/s")}
+
+
+def meld_corpus(n):
+    deals = dealgen.deal_batch(SEED, n)
+    hands = dealgen.hands(deals).tolist()
+    jokers = dealgen.jokers(deals).tolist()
+    return [(hand, wild_ranks_of(j)) for hand, j in zip(hands, jokers)]
+
+
+@case("melds")
+def bench_melds(scale, repeat):
+    corpus = meld_corpus(int(2000 * scale))
+    best = None
+    for r in range(repeat):
+        times = []
+        for hand, wild in corpus:
+            start = time.perf_counter()
+            solve_hand(hand, wild)
+            times.append(time.perf_counter() - start)
+        if (best is None or sum(times) < sum(best)):
+            best = times
+    return {"throughput": rate(len(best) / sum(best), "hands/s"),
+            "p50": latency(percentile(best, 50) * 1e6, "us"),
+            "p99": latency(percentile(best, 99) * 1e6, "us")}
+
+
+@case("scoring")
+def bench_scoring(scale, repeat):
+    from scoring import score_hands
+    n = int(5000 * scale)
+    deals = dealgen.deal_batch(SEED, n)
+    hands = dealgen.hands(deals)
+    joker_ranks = dealgen.joker_ranks(deals)
+    cold = best_of(repeat, lambda: score_hands(hands, joker_ranks, HandCache()))
+    cache = HandCache()
+    score_hands(hands, joker_ranks, cache)
+    warm = best_of(repeat, lambda: score_hands(hands, joker_ranks, cache))
+    return {"cold": rate(n / cold, "hands/s"),
+            "warm": rate(n / warm, "hands/s")}
+
+
+def positions(n):
+    # n tables a few turns into a greedy game, from fixed seeds
+    tables = []
+    for i in range(n):
+        rng = random.Random(SEED * 1000 + i)
+        opendeck = Deck("od", rng=rng)
+        closedeck = DoubleDeck("cd", opendeck, rng)
+        closedeck.shuffle_cards()
+        players = [Me(closedeck, "a"), Me(closedeck, "b")]
+        jokers = closedeck.draw_cards(2)
+        for p in players:
+            p.set_jokers(jokers)
+        opendeck.add_card(closedeck.draw_card())
+        for turn in range(4):
+            done, card = players[turn % 2].take_turn(closedeck, opendeck)
+            opendeck.add_card(card)
+        tables.append((players[0], closedeck, opendeck))
+    return tables
+
+
+@case("ai")
+def bench_ai(scale, repeat):
+    import copy
+    from ismcts import ISMCTSMe, search
+    tables = positions(max(2, int(10 * scale)))
+    results = {}
+
+    # the greedy player's whole turn, solver cache emptied first
+    times = []
+    for me, closedeck, opendeck in tables:
+        for r in range(repeat):
+            me2, cd2, od2 = copy.deepcopy((me, closedeck, opendeck))
+            shared_cache.clear()
+            start = time.perf_counter()
+            me2.take_turn(cd2, od2)
+            times.append(time.perf_counter() - start)
+    results["greedy_turn"] = latency(percentile(times, 50) * 1000, "ms")
+
+    # one ISMCTS decision at a fixed number of playouts
+    for playouts in (50, 200):
+        times = []
+        for me, closedeck, opendeck in tables:
+            info = ISMCTSMe.info_set(me, opendeck)
+            start = time.perf_counter()
+            search(info, True, playouts, seed=SEED)
+            times.append(time.perf_counter() - start)
+        results["ismcts_%d" % playouts] = latency(percentile(times, 50) * 1000, "ms")
+    return results
+
+
+@case("hittest")
+def bench_hittest(scale, repeat):
+    import bench_hittest as bh
+    from hitindex import HitIndex
+    groups = bh.layout(13, 4)
+    index = HitIndex()
+    for gix, g in enumerate(groups):
+        index.place_group(gix, [r.x for r in g], bh.TOP, bh.CARD_W, bh.CARD_H, bh.OFFSET)
+    rng = random.Random(SEED)
+    width = groups[-1][-1].right + 20
+    points = [(rng.randrange(width), rng.randrange(bh.TOP - 20, bh.TOP + bh.CARD_H + 20))
+              for i in range(int(100000 * scale))]
+
+    def run():
+        hit = index.hit
+        for x, y in points:
+            hit(x, y)
+
+    return {"query": latency(best_of(repeat, run) / len(points) * 1e6, "us")}
+
+
+@case("render")
+def bench_render(scale, repeat):
+    import pygame
+    import myrummy
+    pygame.display.init()
+    screen = pygame.display.set_mode((myrummy.screen_width, myrummy.screen_height))
+    background = pygame.Surface(screen.get_size()).convert()
+    background.fill((0, 150, 0))
+    rng = random.Random(SEED)
+    deck = DoubleDeck("cd", None, rng)
+    deck.shuffle_cards()
+    user = myrummy.You(deck, "bench")
+    user.reassign_card_locations()
+    sprites = pygame.sprite.LayeredDirty(user.get_all_cards())
+    sprites.clear(screen, background)
+    frames = int(300 * scale)
+    cards = user.get_all_cards()
+
+    def full():
+        for i in range(frames):
+            screen.blit(background, (0, 0))
+            for s in sprites.sprites():
+                screen.blit(s.image, s.rect)
+            pygame.display.flip()
+
+    def dirty():
+        # one card lifted and put back per frame, as a click does
+        for i in range(frames):
+            s = cards[i % len(cards)]
+            s.rect.y += -10 if i % 2 == 0 else 10
+            s.dirty = 1
+            pygame.display.update(sprites.draw(screen))
+
+    results = {"full_redraw": rate(frames / best_of(repeat, full), "frames/s"),
+               "dirty_redraw": rate(frames / best_of(repeat, dirty), "frames/s")}
+    pygame.display.quit()
+    return results
+
+
+@case("table")
+def bench_table(scale, repeat):
+    # greedy games at the biggest table, 6 players and 3 decks
+    from selfplay import play_game
+    config = TableConfig(6, 3)
+    games = max(2, int(10 * scale))
+    turn = []
+    game = []
+    for r in range(repeat):
+        shared_cache.clear()
+        turns = 0
+        think = 0.0
+        start = time.perf_counter()
+        for seed in range(games):
+            result = play_game(SEED * 1000 + seed, ["greedy"] * config.players, config=config)
+            turns += result.turns
+            think += sum(result.think)
+        game.append((time.perf_counter() - start) / games)
+        turn.append(think / turns)
+    return {"turn_6p3d": latency(min(turn) * 1000, "ms"),
+            "game_6p3d": latency(min(game) * 1000, "ms")}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    env = {"commit": git_commit(),
+           "date": datetime.datetime.now().isoformat(timespec="seconds"),
+           "python": platform.python_version(),
+           "machine": platform.machine(),
+           "system": platform.system(),
+           "cpus": os.cpu_count(),
+           "numpy": np.__version__}
+    try:
+        import pygame
+        env["pygame"] = pygame.version.ver
+    except ImportError:
+        pass
+    return env
+
+
+def run(names, scale, repeat):
+    results = {}
+    for name, f in CASES:
+        if (names and name not in names):
+            continue
+        start = time.perf_counter()
+        metrics = f(scale, repeat)
+        for metric, m in metrics.items():
+            results["%s.%s" % (name, metric)] = m
+            print("%-24s %12.2f %s" % ("%s.%s" % (name, metric), m["value"], m["unit"]))
+        print("%-24s (%.1f s)" % (name, time.perf_counter() - start))
+    return results
+
+
+def compare(old, new, threshold):
+    # prints old against new; returns the metrics that got worse by more
+    # than threshold (a fraction)
+    regressions = []
+    print("%-24s %12s %12s %8s" % ("metric", "old", "new", "change"))
+    for key in sorted(new):
+        if (key not in old):
+            continue
+        a, b = old[key]["value"], new[key]["value"]
+        if (a == 0 or b == 0):
+            continue
+        # > 1 means better, whichever way the metric points
+        gain = b / a if new[key]["better"] == "higher" else a / b
+        flag = ""
+        if (gain < 1.0 - threshold):
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif (gain > 1.0 + threshold):
+            flag = "  faster"
+        print("%-24s %12.2f %12.2f %+7.1f%%%s" % (key, a, b, (gain - 1.0) * 100, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("cases", nargs="*", help="run only these (%s)" % ", ".join(n for n, f in CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best one counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="work per case, e.g. 0.1 for a quick check")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="JSON", help="compare with the results in this file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown that counts as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    for name in args.cases:
+        if (name not in dict(CASES)):
+            parser.error("no case %r" % name)
+    report = {"environment": environment(), "scale": args.scale, "repeat": args.repeat,
+              "results": run(args.cases, args.scale, args.repeat)}
+    if (args.out):
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if (args.compare):
+        with open(args.compare) as f:
+            old = json.load(f)
+        print()
+        print("against %s (%s)" % (args.compare, old["environment"].get("commit")))
+        if (old.get("scale") != args.scale):
+            print("warning: %s was run at scale %s" % (args.compare, old.get("scale")))
+        if (compare(old["results"], report["results"], args.threshold)):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
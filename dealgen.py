@@ -0,0 +1,90 @@
+"""
+Bulk deal generation with NumPy.
+
+A deal is a shuffled double deck in draw order, dealt the way main() deals
+it: the first 13 cards go to the first seat, the next 13 to the second
+(and so on), the next two are the jokers shown beside the closed deck and
+the rest is the closed deck.  deal_batch() makes an (N, 104) uint8 array of
+deals at once; iter_deals() streams a corpus of any size in batches.
+
+Each batch draws from its own child of a SeedSequence, so batch i of a
+corpus is the same whether it is made alone or in a stream, and a corpus
+is fixed by (seed, batch size).
+
+    python dealgen.py -n 1000000 --out deals.npy
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rummycore import NUM_FACES, NUM_RANKS
+
+DECK_SIZE = 2 * NUM_FACES
+HAND_SIZE = 13
+BATCH = 100000
+
+
+def _batch(seed_seq, n):
+    rng = np.random.default_rng(seed_seq)
+    decks = np.broadcast_to(np.arange(DECK_SIZE, dtype=np.uint8), (n, DECK_SIZE))
+    return rng.permuted(decks, axis=1)
+
+
+def deal_batch(seed, n=BATCH, index=0):
+    # batch `index` of the corpus made from seed
+    return _batch(np.random.SeedSequence(seed).spawn(index + 1)[index], n)
+
+
+def iter_deals(seed, total, batch=BATCH):
+    # (N, 104) arrays, batch by batch, until total deals have been made
+    children = np.random.SeedSequence(seed)
+    done = 0
+    while (done < total):
+        n = min(batch, total - done)
+        yield _batch(children.spawn(1)[0], n)
+        done += n
+
+
+def hands(deals, seat=0):
+    return deals[:, seat * HAND_SIZE:(seat + 1) * HAND_SIZE]
+
+
+def jokers(deals, seats=2):
+    return deals[:, seats * HAND_SIZE:seats * HAND_SIZE + 2]
+
+
+def joker_ranks(deals, seats=2):
+    # in the form scoring.score_hands takes
+    return jokers(deals, seats) % NUM_RANKS
+
+
+def closed_decks(deals, seats=2):
+    # what is left to draw, top first
+    return deals[:, seats * HAND_SIZE + 2:]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--deals", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=BATCH)
+    parser.add_argument("--out", help="save the deals to a .npy file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if (args.out):
+        out = np.lib.format.open_memmap(args.out, mode="w+", dtype=np.uint8, shape=(args.deals, DECK_SIZE))
+    row = 0
+    for deals in iter_deals(args.seed, args.deals, args.batch):
+        if (args.out):
+            out[row:row + len(deals)] = deals
+        row += len(deals)
+    if (args.out):
+        out.flush()
+    elapsed = time.perf_counter() - start
+    print("%d deals in %.2f s: %.0f deals/s" % (row, elapsed, row / elapsed))
+
+
+if __name__ == "__main__":
+    main()
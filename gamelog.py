@@ -0,0 +1,214 @@
+"""
+Compact binary game log.
+
+A log file is MAGIC followed by fixed 4-byte records (type, seat, card,
+arg), one card per byte.  A game is a START record, the deal (DEAL per
+card, the JOKERs and the TURN_UP card), then DRAW, DISCARD, GROUP and
+DECLARE records as they happen, a SCORE per seat and an END.  Files are only
+ever appended to, so a log can collect games from many runs.
+
+GameRecord builds one game in memory; append_games() writes finished games
+to a file.  The reader maps the file and views it as a NumPy record array
+without copying, so summaries over millions of games are array operations,
+and replay() walks one game's events (Replay rebuilds the hands).
+
+    python gamelog.py games.log
+"""
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"RUMMYLG1"
+RECORD = struct.Struct("<BBBB")
+RECORD_DTYPE = np.dtype([("type", "u1"), ("seat", "u1"), ("card", "u1"), ("arg", "u1")])
+
+START = 1       # seat: number of seats
+DEAL = 2        # card dealt to seat
+JOKER = 3       # card shown beside the closed deck
+TURN_UP = 4     # first card of the open pile
+DRAW = 5        # arg: 1 from the open pile, 0 from the closed deck
+DISCARD = 6
+GROUP = 7       # card moved to group arg of seat's hand
+DECLARE = 8     # arg: 1 if the hand was valid
+SCORE = 9       # seat's deadwood, card + 256 * arg
+END = 10        # seat: the winner, NO_SEAT if nobody declared
+
+NO_SEAT = 255
+NO_CARD = 255
+
+NAMES = {START: "start", DEAL: "deal", JOKER: "joker", TURN_UP: "turn-up", DRAW: "draw",
+         DISCARD: "discard", GROUP: "group", DECLARE: "declare", SCORE: "score", END: "end"}
+
+
+class GameRecord():
+    def __init__(self, seats):
+        self.data = bytearray()
+        self.add(START, seats)
+
+    def add(self, type, seat=NO_SEAT, card=NO_CARD, arg=0):
+        self.data += RECORD.pack(type, seat, card, arg)
+
+    def deal(self, seat, cards):
+        for c in cards:
+            self.add(DEAL, seat, c)
+
+    def joker(self, card):
+        self.add(JOKER, NO_SEAT, card)
+
+    def turn_up(self, card):
+        self.add(TURN_UP, NO_SEAT, card)
+
+    def draw(self, seat, card, from_open):
+        self.add(DRAW, seat, card, 1 if from_open else 0)
+
+    def discard(self, seat, card):
+        self.add(DISCARD, seat, card)
+
+    def group(self, seat, card, gix):
+        self.add(GROUP, seat, card, gix)
+
+    def declare(self, seat, valid):
+        self.add(DECLARE, seat, NO_CARD, 1 if valid else 0)
+
+    def end(self, winner, points):
+        for seat, p in enumerate(points):
+            p = min(p, 0xffff)
+            self.add(SCORE, seat, p & 0xff, p >> 8)
+        self.add(END, NO_SEAT if winner is None else winner)
+        return bytes(self.data)
+
+
+def append_games(path, games):
+    # games are the bytes of finished GameRecords
+    with open(path, "ab") as f:
+        if (f.tell() == 0):
+            f.write(MAGIC)
+        for data in games:
+            f.write(data)
+
+
+class GameLogWriter():
+    # records straight to a file as the game goes, for the window
+    def __init__(self, path):
+        self.file = open(path, "ab")
+        if (self.file.tell() == 0):
+            self.file.write(MAGIC)
+        self.record = None
+
+    def start(self, seats):
+        self.record = GameRecord(seats)
+        return self.record
+
+    def flush(self):
+        if (self.record is not None):
+            self.file.write(self.record.data)
+            self.record.data = bytearray()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class Replay():
+    # the hands and the open pile as a game's events are applied
+    def __init__(self):
+        self.hands = []
+        self.open_pile = []
+        self.jokers = []
+        self.winner = None
+
+    def apply(self, type, seat, card, arg):
+        if (type == START):
+            self.hands = [[] for s in range(seat)]
+        elif (type == DEAL):
+            self.hands[seat].append(card)
+        elif (type == JOKER):
+            self.jokers.append(card)
+        elif (type == TURN_UP):
+            self.open_pile.append(card)
+        elif (type == DRAW):
+            if (arg):
+                assert (self.open_pile.pop() == card)
+            self.hands[seat].append(card)
+        elif (type == DISCARD):
+            self.hands[seat].remove(card)
+            self.open_pile.append(card)
+        elif (type == DECLARE):
+            self.winner = seat if arg else None
+
+
+class GameLog():
+    # a log file mapped into memory and viewed as records
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if (size < len(MAGIC)):
+            raise ValueError("not a game log: " + path)
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if (self.map[:len(MAGIC)] != MAGIC):
+            raise ValueError("not a game log: " + path)
+        count = (size - len(MAGIC)) // RECORD.size
+        self.records = np.frombuffer(self.map, dtype=RECORD_DTYPE, count=count, offset=len(MAGIC))
+        self.starts = np.flatnonzero(self.records["type"] == START)
+
+    def close(self):
+        self.records = None
+        self.starts = None
+        self.map.close()
+        self.file.close()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _bounds(self, i):
+        stop = self.starts[i + 1] if i + 1 < len(self.starts) else len(self.records)
+        return int(self.starts[i]), int(stop)
+
+    def game(self, i):
+        # the records of game i, still a view into the file
+        start, stop = self._bounds(i)
+        return self.records[start:stop]
+
+    def replay(self, i):
+        # (type, seat, card, arg) of each event of game i
+        start, stop = self._bounds(i)
+        return RECORD.iter_unpack(self.map[len(MAGIC) + start * RECORD.size:len(MAGIC) + stop * RECORD.size])
+
+    def replay_state(self, i):
+        replay = Replay()
+        for event in self.replay(i):
+            replay.apply(*event)
+        return replay
+
+    def summary(self):
+        # whole-file statistics without a Python loop over records
+        r = self.records
+        ends = r[r["type"] == END]
+        scores = r[r["type"] == SCORE]
+        points = scores["card"].astype(np.int64) + 256 * scores["arg"].astype(np.int64)
+        winners = ends["seat"]
+        lines = ["%d games, %d records" % (len(self.starts), len(r))]
+        turns = np.count_nonzero(r["type"] == DISCARD)
+        if (len(ends)):
+            lines.append("average turns %.1f, average deadwood %.1f" % (turns / len(ends), points.mean()))
+        for seat in np.unique(winners):
+            name = "nobody" if seat == NO_SEAT else "seat %d" % seat
+            lines.append("%-8s won %d" % (name, np.count_nonzero(winners == seat)))
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    for path in argv:
+        log = GameLog(path)
+        print(path)
+        print(log.summary())
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Immutable game state with structural sharing.
+
+A GameState holds everything about a table at one moment: the closed deck
+and the open pile, each seat's hand as its groups of cards, the jokers,
+whose turn it is and whether that seat has drawn yet.  Nothing in it is
+ever changed; a move returns a new state.  The piles are linked lists
+(Pile) so pushing or popping a card makes one node and shares the rest,
+and the hands are tuples, so a new state costs a handful of small objects
+however many states branch from it.  Search, undo and what-if analysis can
+keep as many states as they like.
+"""
+from collections import deque
+
+from rummycore import CGroup, CGroupType, card_face
+
+
+class Pile():
+    # a persistent stack; the empty pile is EMPTY
+    __slots__ = ("card", "below", "size")
+
+    def __init__(self, card, below, size):
+        self.card = card
+        self.below = below
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        # top first
+        pile = self
+        while (pile.size):
+            yield pile.card
+            pile = pile.below
+
+    def push(self, card):
+        return Pile(card, self, self.size + 1)
+
+    def pop(self):
+        # (top card, pile below it)
+        if (not self.size):
+            raise IndexError("pop from an empty pile")
+        return self.card, self.below
+
+    def top(self):
+        return self.card if self.size else None
+
+    def cards(self):
+        # bottom first, the order a Deck keeps them in
+        cards = list(self)
+        cards.reverse()
+        return cards
+
+    @staticmethod
+    def from_cards(cards):
+        # cards bottom first
+        pile = EMPTY
+        for c in cards:
+            pile = Pile(c, pile, pile.size + 1)
+        return pile
+
+
+EMPTY = Pile(None, None, 0)
+
+
+class GameState():
+    __slots__ = ("closed", "open", "hands", "jokers", "wild_ranks", "turn", "drawn", "winner")
+
+    def __init__(self, closed, open, hands, jokers=(), wild_ranks=(), turn=0, drawn=False, winner=None):
+        self.closed = closed
+        self.open = open
+        self.hands = hands              # per seat, a tuple of groups (tuples of cards)
+        self.jokers = jokers
+        self.wild_ranks = wild_ranks
+        self.turn = turn
+        self.drawn = drawn              # the seat on turn has drawn and must throw
+        self.winner = winner
+
+    def _with(self, closed=None, open=None, hands=None, turn=None, drawn=None, winner=None):
+        return GameState(self.closed if closed is None else closed,
+                         self.open if open is None else open,
+                         self.hands if hands is None else hands,
+                         self.jokers, self.wild_ranks,
+                         self.turn if turn is None else turn,
+                         self.drawn if drawn is None else drawn,
+                         self.winner if winner is None else winner)
+
+    def cards(self, seat):
+        return [c for g in self.hands[seat] for c in g]
+
+    def _set_hand(self, seat, groups):
+        hands = list(self.hands)
+        hands[seat] = groups
+        return tuple(hands)
+
+    def draw(self, from_open, rng=None):
+        # the seat on turn takes the open card or the top of the closed
+        # deck; the new card goes in a group of its own at the end
+        assert (not self.drawn and self.winner is None)
+        closed, open = self.closed, self.open
+        if (from_open):
+            card, open = open.pop()
+        else:
+            if (not closed.size):
+                # turn the open pile over, all but its top card
+                top, below = open.pop()
+                cards = below.cards()
+                rng.shuffle(cards)
+                closed, open = Pile.from_cards(cards), EMPTY.push(top)
+            card, closed = closed.pop()
+        groups = self.hands[self.turn] + ((card,),)
+        return self._with(closed, open, self._set_hand(self.turn, groups), drawn=True)
+
+    def throw(self, card, declare=False):
+        # the seat on turn throws card; a declare ends the game (whether
+        # the hand is valid is for the caller to check)
+        assert (self.drawn and self.winner is None)
+        groups = []
+        for g in self.hands[self.turn]:
+            if (card in g):
+                g = tuple(c for c in g if c != card)
+                if (not g):
+                    continue
+            groups.append(g)
+        hands = self._set_hand(self.turn, tuple(groups))
+        if (declare):
+            return self._with(open=self.open.push(card), hands=hands, drawn=False, winner=self.turn)
+        return self._with(open=self.open.push(card), hands=hands,
+                          turn=(self.turn + 1) % len(self.hands), drawn=False)
+
+    def regroup(self, seat, groups):
+        # the same cards arranged in other groups
+        groups = tuple(tuple(g) for g in groups if g)
+        assert (sorted(c for g in groups for c in g) == sorted(self.cards(seat)))
+        return self._with(hands=self._set_hand(seat, groups))
+
+    @staticmethod
+    def from_table(closedeck, opendeck, players, jokers=(), wild_ranks=(), turn=0):
+        hands = tuple(tuple(tuple(cg.cards) for cg in p.cardgroups if cg.cards) for p in players)
+        return GameState(Pile.from_cards(closedeck.cards), Pile.from_cards(opendeck.cards), hands,
+                         tuple(jokers), tuple(wild_ranks), turn)
+
+    def restore_hand(self, player, seat):
+        # put seat's groups back into a live Player
+        player.cardgroups = []
+        for g in self.hands[seat]:
+            new_group = CGroup(CGroupType.UNKNOWN)
+            new_group.cards = list(g)
+            player.cardgroups.append(new_group)
+        player.cards = sorted(self.cards(seat), key=card_face)
+
+    def restore_piles(self, closedeck, opendeck):
+        closedeck.cards = deque(self.closed.cards())
+        opendeck.cards = deque(self.open.cards())
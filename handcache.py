@@ -0,0 +1,123 @@
+"""
+Memoized hand evaluation.
+
+The AI solves the same hands over and over while it weighs every discard
+and pickup.  HandCache keys a hand by its multiset of faces (the copies of
+a card collapse to one face with a count, and so do the printed jokers)
+plus the wild ranks, keeps the solved partitions in a bounded LRU, and can be
+saved to disk to start the next run warm.
+"""
+from collections import OrderedDict
+import os
+import pickle
+
+from rummycore import JOKER_FACE, NUM_CARDS, NUM_RANKS, PRINTED_JOKER, card_face
+from melds import MeldPartition, solve_hand
+
+CACHE_VERSION = 2
+
+# what each card adds to a key: 2 bits per face, and the printed jokers
+# (JOKER_FACE, just above the faces) get 3 bits to count up to 6
+_FACE_BIT = tuple(1 << (2 * card_face(c)) for c in range(NUM_CARDS))
+WILD_SHIFT = 2 * JOKER_FACE + 3
+
+
+def hand_key(cards, wild_ranks=()):
+    # the face counts, the wild rank mask above them
+    key = 0
+    for c in cards:
+        key += _FACE_BIT[c]
+    for r in wild_ranks:
+        key |= 1 << (WILD_SHIFT + r)
+    return key
+
+
+def _to_faces(groups):
+    return tuple(tuple(card_face(c) for c in g) for g in groups)
+
+
+class HandCache():
+    def __init__(self, maxsize=200000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, cards, wild_ranks=()):
+        # (points, pure, impure, sets, deadwood) with groups as faces
+        key = hand_key(cards, wild_ranks)
+        entry = self.entries.get(key)
+        if (entry is not None):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        part = solve_hand(cards, wild_ranks)
+        entry = (part.points, _to_faces(part.pure_seqs), _to_faces(part.impure_seqs),
+                 _to_faces(part.sets), tuple(card_face(c) for c in part.deadwood))
+        self.entries[key] = entry
+        if (len(self.entries) > self.maxsize):
+            self.entries.popitem(last=False)
+        return entry
+
+    def points(self, cards, wild_ranks=()):
+        return self.lookup(cards, wild_ranks)[0]
+
+    def evaluate(self, cards, wild_ranks=()):
+        # (points, valid declare) without building the partition
+        points, pure, impure, sets, deadwood = self.lookup(cards, wild_ranks)
+        valid = (len(pure) > 0 and len(pure) + len(impure) >= 2
+                 and all(f == JOKER_FACE or f % NUM_RANKS in wild_ranks for f in deadwood))
+        return points, valid
+
+    def solve(self, cards, wild_ranks=()):
+        # the cached partition, with the hand's own cards put back in
+        points, pure, impure, sets, deadwood = self.lookup(cards, wild_ranks)
+        by_face = {}
+        for c in cards:
+            by_face.setdefault(card_face(c), []).append(c)
+        wild = set(wild_ranks)
+        part = MeldPartition()
+        part.pure_seqs = [[by_face[f].pop() for f in g] for g in pure]
+        part.impure_seqs = [[by_face[f].pop() for f in g] for g in impure]
+        part.sets = [[by_face[f].pop() for f in g] for g in sets]
+        part.deadwood = [by_face[f].pop() for f in deadwood]
+        part.jokers = [c for c in cards if c >= PRINTED_JOKER or c % NUM_RANKS in wild]
+        part.points = points
+        return part
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return "hand cache: %d entries, %d hits, %d misses (%.1f%% hit rate)" % (
+            len(self.entries), self.hits, self.misses, rate)
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((CACHE_VERSION, list(self.entries.items())), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        # a missing or stale file just leaves the cache cold
+        try:
+            with open(path, "rb") as f:
+                version, items = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False
+        if (version != CACHE_VERSION):
+            return False
+        for key, entry in items[-self.maxsize:]:
+            self.entries[key] = entry
+        return True
+
+
+shared_cache = HandCache()
@@ -0,0 +1,167 @@
+"""
+Incremental layout of the cards in a hand.
+
+The hand is a row of groups laid out left to right, the cards of a group
+overlapping by `offset` pixels and a gap between groups.  HandLayout keeps
+the groups, where each one starts, the card sprites and the HitIndex in
+step, and applies edits (group, move, insert, remove, ungroup) to them:
+only the groups an edit touches are placed again, and the groups to their
+right are slid sideways by the change in width, so no edit rebuilds the
+hand, the sprite group or the hit index.
+
+Groups are never taken out, only emptied (an empty group takes no room),
+so a group keeps its index for as long as the layout lives.  The group
+lists are the caller's; the layout edits them in place.
+"""
+from hitindex import HitIndex
+
+
+class HandLayout():
+    def __init__(self, x, y, offset, gap, sprites, make_sprite):
+        self.x = x
+        self.y = y
+        self.offset = offset
+        self.gap = gap
+        self.sprites = sprites          # card -> sprite, for the cards in the hand
+        self.make_sprite = make_sprite
+        self.groups = []
+        self.xs = []                    # left edge of each group
+        self.hit_index = HitIndex()
+        self.sprite_group = None
+        self.layer = 0
+
+    def attach(self, sprite_group, layer=0):
+        # draw the hand's sprites in sprite_group, and the ones added later
+        self.sprite_group = sprite_group
+        self.layer = layer
+        sprite_group.add([self.sprites[c] for g in self.groups for c in g], layer=layer)
+
+    def reset(self, groups, x=None):
+        # lay out a whole new arrangement, e.g. after an undo
+        if (x is not None):
+            self.x = x
+        self.groups = groups
+        self.xs = []
+        self.hit_index.clear()
+        xpos = self.x
+        for gix, g in enumerate(groups):
+            for c in g:
+                if (c not in self.sprites):
+                    self._add_sprite(c)
+            self.xs.append(xpos)
+            self._place(gix)
+            xpos += self._extent(gix)
+
+    def _add_sprite(self, card):
+        sprite = self.sprites[card] = self.make_sprite(card)
+        if (self.sprite_group is not None):
+            self.sprite_group.add(sprite, layer=self.layer)
+
+    def _extent(self, gix):
+        # room the group takes, the gap after it included
+        g = self.groups[gix]
+        if (not g):
+            return 0
+        return (len(g) - 1) * self.offset + self.sprites[g[-1]].rect.width + self.gap
+
+    def _place(self, gix, first=0):
+        # cards before first are known to be in place already
+        g = self.groups[gix]
+        xpos = self.xs[gix] + first * self.offset
+        for c in g[first:]:
+            s = self.sprites[c]
+            if (s.rect.x != xpos or s.rect.y != self.y):
+                s.rect.x, s.rect.y = xpos, self.y
+                s.dirty = 1
+            xpos += self.offset
+        if (g):
+            last = self.sprites[g[-1]].rect
+            self.hit_index.place_group(gix, [self.xs[gix] + k * self.offset for k in range(len(g))], self.y,
+                                       last.width, last.height, self.offset)
+        else:
+            self.hit_index.remove_group(gix)
+
+    def _edit(self, gix, change, first=0):
+        # apply change() to group gix, place it again from card first on
+        # and slide the groups after it by however much wider or narrower
+        # it got
+        before = self._extent(gix)
+        change(self.groups[gix])
+        self._place(gix, first)
+        dx = self._extent(gix) - before
+        if (dx):
+            after = range(gix + 1, len(self.groups))
+            sprites = self.sprites
+            for g in after:
+                self.xs[g] += dx
+                for c in self.groups[g]:
+                    s = sprites[c]
+                    s.rect.x += dx
+                    s.dirty = 1
+            self.hit_index.shift_groups(after, dx)
+
+    def group(self, picks, cards=None):
+        # move the (group index, card index) picks into a new group at the
+        # right end, in the order picked; cards is the list to use for it.
+        # Returns the new group's index
+        unique = []
+        for p in picks:
+            if (p not in unique):
+                unique.append(p)
+        if (cards is None):
+            cards = []
+        cards[:] = [self.groups[gix][cix] for gix, cix in unique]
+        # take the cards out from the back so the other indices stay put
+        for gix, cix in sorted(unique, reverse=True):
+            self._edit(gix, lambda g, cix=cix: g.pop(cix), cix)
+        return self._append(cards)
+
+    def _append(self, cards):
+        last = len(self.groups) - 1
+        self.xs.append(self.xs[last] + self._extent(last) if self.groups else self.x)
+        self.groups.append(cards)
+        for c in cards:
+            if (c not in self.sprites):
+                self._add_sprite(c)
+        self._place(len(self.groups) - 1)
+        return len(self.groups) - 1
+
+    def move(self, gix, cix, to_gix, to_cix=None):
+        # one card to another place, at the end of to_gix if to_cix is None
+        card = self.groups[gix][cix]
+        self._edit(gix, lambda g: g.pop(cix), cix)
+        if (to_cix is None):
+            to_cix = len(self.groups[to_gix])
+        self._edit(to_gix, lambda g: g.insert(to_cix, card), to_cix)
+        return card
+
+    def insert(self, card, gix, cix=None):
+        # a card new to the hand, e.g. just drawn
+        if (card not in self.sprites):
+            self._add_sprite(card)
+        if (cix is None):
+            cix = len(self.groups[gix])
+        self._edit(gix, lambda g: g.insert(cix, card), cix)
+
+    def remove(self, card):
+        # a card leaving the hand, e.g. thrown; its sprite is returned
+        for gix, g in enumerate(self.groups):
+            if (card in g):
+                cix = g.index(card)
+                self._edit(gix, lambda g: g.pop(cix), cix)
+                break
+        sprite = self.sprites.pop(card)
+        if (self.sprite_group is not None):
+            self.sprite_group.remove(sprite)
+        return sprite
+
+    def ungroup(self, gix, into=0):
+        # give a group's cards back to group into, at its end
+        if (gix == into):
+            return
+        cards = list(self.groups[gix])
+        self._edit(gix, lambda g: g.clear())
+        self._edit(into, lambda g: g.extend(cards), len(self.groups[into]))
+
+    def hit(self, x, y):
+        return self.hit_index.hit(x, y)
@@ -0,0 +1,101 @@
+"""
+Hit-test index for the cards in a hand.
+
+Cards in a group overlap: each one shows a strip `offset` pixels wide and
+the last card of the group shows its whole face.  HitIndex keeps those
+strips per row, sorted by x, so the card under a point is found with two
+bisections and no allocation.  A group's strips are replaced whenever
+the group's cards are placed, and slid along when the group only moves.
+"""
+from bisect import bisect_left, bisect_right
+
+
+class _Row():
+    def __init__(self, top, bottom):
+        self.top = top
+        self.bottom = bottom
+        self.starts = []
+        self.ends = []
+        self.hits = []      # (group index, card index) per strip
+
+
+class HitIndex():
+    def __init__(self):
+        self.rows = []
+        self.tops = []
+        self.groups = {}    # group index -> row holding it
+        self.sizes = {}     # group index -> number of strips
+
+    def clear(self):
+        self.rows = []
+        self.tops = []
+        self.groups = {}
+        self.sizes = {}
+
+    def _row(self, top, bottom):
+        i = bisect_right(self.tops, top) - 1
+        if (i >= 0 and self.tops[i] == top):
+            return self.rows[i]
+        row = _Row(top, bottom)
+        self.rows.insert(i + 1, row)
+        self.tops.insert(i + 1, top)
+        return row
+
+    def remove_group(self, gix):
+        # a group's strips lie next to each other in its row
+        row = self.groups.pop(gix, None)
+        if (row is None):
+            return
+        k = row.hits.index((gix, 0))
+        n = self.sizes.pop(gix)
+        del row.starts[k:k + n]
+        del row.ends[k:k + n]
+        del row.hits[k:k + n]
+
+    def shift_groups(self, gixs, dx):
+        # groups lying next to each other in one row, left to right, moved
+        # dx pixels sideways past no other group
+        first = None
+        n = 0
+        for gix in gixs:
+            if (gix in self.groups):
+                if (first is None):
+                    first = gix
+                n += self.sizes[gix]
+        if (first is None):
+            return
+        row = self.groups[first]
+        k = row.hits.index((first, 0))
+        row.starts[k:k + n] = [x + dx for x in row.starts[k:k + n]]
+        row.ends[k:k + n] = [x + dx for x in row.ends[k:k + n]]
+
+    def place_group(self, gix, xs, top, width, height, offset):
+        # xs are the left edges of the group's cards, left to right
+        self.remove_group(gix)
+        if (not xs):
+            return
+        row = self._row(top, top + height)
+        row.bottom = max(row.bottom, top + height)
+        # a group that was empty starts where the next one does; it goes first
+        at = bisect_left(row.starts, xs[0])
+        last = len(xs) - 1
+        starts = list(xs)
+        ends = [x + offset for x in xs[:last]] + [xs[last] + width]
+        hits = [(gix, cix) for cix in range(len(xs))]
+        row.starts[at:at] = starts
+        row.ends[at:at] = ends
+        row.hits[at:at] = hits
+        self.groups[gix] = row
+        self.sizes[gix] = len(xs)
+
+    def hit(self, x, y):
+        # (group index, card index) of the card under x, y, or None
+        i = bisect_right(self.tops, y) - 1
+        while (i >= 0):
+            row = self.rows[i]
+            if (y < row.bottom):
+                k = bisect_right(row.starts, x) - 1
+                if (k >= 0 and x < row.ends[k]):
+                    return row.hits[k]
+            i -= 1
+        return None
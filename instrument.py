@@ -0,0 +1,210 @@
+"""
+Named timers, counters and latency histograms for the hot paths.
+
+Everything is off until enable() is called (or RUMMY_INSTRUMENT is set in
+the environment); while off, timer() hands back one shared do-nothing
+context and count() returns at once, so the hooks can stay in the code.
+
+    with instrument.timer("make_groups"):
+        ...
+    instrument.count("cache_miss")
+
+Times go into histograms with power-of-two buckets from 1 µs up, which
+keep a fixed size however long the program runs.  report() prints them;
+enable() can dump them on exit and every so many seconds.
+
+A cProfile capture can be asked for a number of "frame"s or "turn"s: the
+code marks where a frame or turn begins and ends, and after the last one
+the profile is written to a file and its top functions printed.
+"""
+import atexit
+import contextlib
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+enabled = bool(os.environ.get("RUMMY_INSTRUMENT"))
+
+BUCKETS = 32            # 1 µs .. ~35 min
+
+histograms = {}
+counters = {}
+_lock = threading.Lock()
+_dump_every = None
+_last_dump = 0.0
+_captures = {}
+
+
+class Histogram():
+    def __init__(self):
+        self.buckets = [0] * BUCKETS     # bucket i: below 2**i µs
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        us = int(seconds * 1e6)
+        self.buckets[min(us.bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if (seconds > self.max):
+            self.max = seconds
+
+    def percentile(self, p):
+        # the upper edge of the bucket holding the p-th percentile, in s
+        rank = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if (n and seen >= rank):
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+
+def record(name, seconds):
+    with _lock:
+        h = histograms.get(name)
+        if (h is None):
+            h = histograms[name] = Histogram()
+        h.add(seconds)
+
+
+def count(name, n=1):
+    if (not enabled):
+        return
+    with _lock:
+        counters[name] = counters.get(name, 0) + n
+
+
+class _Timer():
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoTimer():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_no_timer = _NoTimer()
+
+
+def timer(name):
+    if (not enabled):
+        return _no_timer
+    return _Timer(name)
+
+
+def timed(name):
+    # decorator form of timer(); the flag is read on every call
+    def wrap(f):
+        def timed_f(*args, **kwargs):
+            if (not enabled):
+                return f(*args, **kwargs)
+            with _Timer(name):
+                return f(*args, **kwargs)
+        timed_f.__name__ = f.__name__
+        timed_f.__doc__ = f.__doc__
+        return timed_f
+    return wrap
+
+
+def report(file=None):
+    file = sys.stdout if file is None else file
+    with _lock:
+        items = sorted(histograms.items())
+        counts = sorted(counters.items())
+    if (items):
+        print("%-16s %8s %10s %10s %10s %10s" % ("timer", "count", "mean ms", "p50 ms", "p99 ms", "max ms"),
+              file=file)
+    for name, h in items:
+        print("%-16s %8d %10.3f %10.3f %10.3f %10.3f" % (
+            name, h.count, h.total / h.count * 1000, h.percentile(50) * 1000,
+            h.percentile(99) * 1000, h.max * 1000), file=file)
+    for name, n in counts:
+        print("%-16s %8d" % (name, n), file=file)
+
+
+def tick():
+    # call from a main loop; dumps every dump_every seconds
+    global _last_dump
+    if (not enabled or _dump_every is None):
+        return
+    now = time.perf_counter()
+    if (now - _last_dump >= _dump_every):
+        _last_dump = now
+        report()
+
+
+def enable(dump_on_exit=True, dump_every=None):
+    global enabled, _dump_every, _last_dump
+    enabled = True
+    _dump_every = dump_every
+    _last_dump = time.perf_counter()
+    if (dump_on_exit):
+        atexit.register(report)
+
+
+class _Capture():
+    def __init__(self, what, n, path):
+        self.what = what
+        self.left = n
+        self.path = path
+        self.profile = cProfile.Profile()
+        self.active = False
+
+    def finish(self):
+        self.profile.dump_stats(self.path)
+        print("profile of %s written to %s" % (self.what, self.path))
+        pstats.Stats(self.profile).sort_stats("cumulative").print_stats(15)
+
+
+def capture(what, n, path=None):
+    # profile the next n frames or turns (what) into path
+    _captures[what] = _Capture(what, n, path or "%s.prof" % what)
+
+
+def profile_begin(what):
+    c = _captures.get(what)
+    if (c is None or c.active):
+        return
+    c.active = True
+    c.profile.enable()
+
+
+def profile_end(what):
+    c = _captures.get(what)
+    if (c is None or not c.active):
+        return
+    c.profile.disable()
+    c.active = False
+    c.left -= 1
+    if (c.left <= 0):
+        del _captures[what]
+        c.finish()
+
+
+@contextlib.contextmanager
+def profiled(what):
+    # profile_begin/profile_end around a block, on the current thread
+    profile_begin(what)
+    try:
+        yield
+    finally:
+        profile_end(what)
@@ -0,0 +1,371 @@
+"""
+Information-set Monte Carlo tree search player.
+
+The player cannot see the opponent's hand or the order of the closed deck,
+so every iteration of the search deals those out afresh (a determinization)
+from the cards it has not seen, consistent with what it knows: its own
+hand, the open pile, the jokers shown beside the closed deck and any open
+cards the opponent picked up.  All iterations share one tree of moves
+(single-observer ISMCTS); a move's UCB uses the number of iterations in
+which it was legal.  Below the tree the game is played on for a few turns
+with a cheap policy and the hands are scored by their deadwood.
+
+A turn is two searches: which pile to draw from, then, with the drawn card
+in hand, which card to throw.  A throw that leaves a valid hand is a
+declare and is taken without searching.  Searches stop after a number of
+playouts or at a deadline and can be spread over processes (root
+parallelization: independent trees whose root counts are summed).
+
+    python ismcts.py --seconds 1 -j 4
+"""
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from handcache import shared_cache
+from melds import card_points
+from rummycore import DEFAULT_TABLE, Deck, DoubleDeck, Me, NUM_FACES, NUM_RANKS, card_face, card_str
+
+DRAW_OPEN = -1
+DRAW_CLOSED = -2
+
+UCB_C = 0.7
+ROLLOUT_TURNS = 1       # turns each player plays below the tree
+POINTS_SCALE = 30.0     # deadwood difference that is worth most of a win
+PLAYOUTS = 200          # per decision when there is no deadline
+CANDIDATES = 4          # throws searched: the best by deadwood left
+
+
+class InfoSet():
+    # what the player to move knows; cards are ids, the player is seat 0.
+    # Only the faces of the unseen and opponent cards matter
+    def __init__(self, hand, open_pile, opp_known, opp_size, unseen, wild_ranks):
+        self.hand = list(hand)
+        self.open_pile = list(open_pile)
+        self.opp_known = list(opp_known)
+        self.opp_size = opp_size
+        self.unseen = list(unseen)
+        self.wild_ranks = tuple(wild_ranks)
+
+    def determinize(self, rng):
+        # an opponent hand and a closed deck that fit what has been seen
+        pool = list(self.unseen)
+        rng.shuffle(pool)
+        need = self.opp_size - len(self.opp_known)
+        return _Sim([list(self.hand), self.opp_known + pool[:need]], pool[need:],
+                    list(self.open_pile), self.wild_ranks, rng)
+
+
+class _Sim():
+    # one determinized game; the state is plain lists so copies are cheap
+    def __init__(self, hands, closed, open_pile, wild_ranks, rng, player=0, drawing=True):
+        self.hands = hands
+        self.closed = closed
+        self.open_pile = open_pile
+        self.wild_ranks = wild_ranks
+        self.rng = rng
+        self.player = player
+        self.drawing = drawing
+        self.winner = None
+
+    def actions(self):
+        if (self.drawing):
+            actions = []
+            if (self.closed or len(self.open_pile) > 1):
+                actions.append(DRAW_CLOSED)
+            if (self.open_pile):
+                actions.append(DRAW_OPEN)
+            return actions
+        # throws are faces: the two copies of a card are the same move
+        return list(set(c % NUM_FACES for c in self.hands[self.player]))
+
+    def draw(self, action):
+        hand = self.hands[self.player]
+        if (action == DRAW_OPEN):
+            hand.append(self.open_pile.pop())
+        else:
+            if (not self.closed):
+                # turn the open pile over, all but its top card
+                top = self.open_pile.pop()
+                self.closed, self.open_pile = self.open_pile, [top]
+                self.rng.shuffle(self.closed)
+            hand.append(self.closed.pop())
+        self.drawing = False
+
+    def throw(self, face, check=True):
+        hand = self.hands[self.player]
+        for i, c in enumerate(hand):
+            if (c % NUM_FACES == face):
+                self.open_pile.append(hand.pop(i))
+                break
+        if (check and shared_cache.evaluate(hand, self.wild_ranks)[1]):
+            self.winner = self.player
+        self.player ^= 1
+        self.drawing = True
+
+    def apply(self, action):
+        if (self.drawing):
+            self.draw(action)
+        else:
+            self.throw(action)
+
+
+def _links(card, hand, wild_ranks):
+    # how much a card is worth keeping: its neighbours in a run or a set
+    if (card % NUM_RANKS in wild_ranks):
+        return 100
+    face = card % NUM_FACES
+    suit, rank = face // NUM_RANKS, face % NUM_RANKS
+    links = 0
+    for c in hand:
+        f = c % NUM_FACES
+        if (f == face):
+            continue
+        if (f // NUM_RANKS == suit):
+            d = abs(f % NUM_RANKS - rank)
+            if (d == 1 or d == 12):
+                links += 2
+            elif (d == 2 or d == 11):
+                links += 1
+        elif (f % NUM_RANKS == rank):
+            links += 2
+        if (c % NUM_RANKS in wild_ranks):
+            links += 1
+    return links
+
+
+def _rollout_turn(sim):
+    # draw the open card if it joins something, throw the loosest card
+    hand = sim.hands[sim.player]
+    wild = sim.wild_ranks
+    if (sim.drawing):
+        if (sim.open_pile and _links(sim.open_pile[-1], hand, wild) >= 2):
+            sim.draw(DRAW_OPEN)
+        elif (sim.closed or len(sim.open_pile) > 1):
+            sim.draw(DRAW_CLOSED)
+        else:
+            return False
+    worst = min(hand, key=lambda c: (_links(c, hand, wild), -card_points(c)))
+    sim.throw(worst % NUM_FACES, check=False)
+    return True
+
+
+def _reward(sim):
+    # seat 0's result in [0, 1]
+    if (sim.winner is not None):
+        return 1.0 if sim.winner == 0 else 0.0
+    mine, my_valid = shared_cache.evaluate(sim.hands[0], sim.wild_ranks)
+    theirs, their_valid = shared_cache.evaluate(sim.hands[1], sim.wild_ranks)
+    if (my_valid != their_valid):
+        return 1.0 if my_valid else 0.0
+    return 0.5 + 0.5 * math.tanh((theirs - mine) / POINTS_SCALE)
+
+
+class _Node():
+    def __init__(self, mover, action=None):
+        self.mover = mover      # seat that made the move leading here
+        self.action = action
+        self.children = {}
+        self.visits = 0
+        self.avail = 0
+        self.reward = 0.0
+
+
+def search(info, drawing, playouts=None, deadline=None, seed=None, budget=None, candidates=None):
+    # root visit counts {action: visits} and the number of playouts; stops
+    # after `playouts`, at `deadline` (perf_counter) or when budget expires.
+    # candidates, if given, are the only moves tried at the root
+    rng = random.Random(seed)
+    root = _Node(1)
+    n = 0
+    while (True):
+        if (playouts is not None and n >= playouts):
+            break
+        if (deadline is not None and time.perf_counter() >= deadline):
+            break
+        if (budget is not None and budget.expired()):
+            break
+        n += 1
+        sim = info.determinize(rng)
+        sim.drawing = drawing
+        node = root
+        path = [root]
+
+        # selection and expansion
+        while (sim.winner is None):
+            legal = candidates if node is root and candidates else sim.actions()
+            if (not legal):
+                break
+            for a in legal:
+                child = node.children.get(a)
+                if (child is not None):
+                    child.avail += 1
+            untried = [a for a in legal if a not in node.children]
+            if (untried):
+                a = rng.choice(untried)
+                child = node.children[a] = _Node(sim.player, a)
+                child.avail = 1
+                sim.apply(a)
+                path.append(child)
+                break
+            log = math.log
+            node = max((node.children[a] for a in legal),
+                       key=lambda c: c.reward / c.visits + UCB_C * math.sqrt(log(c.avail) / c.visits))
+            sim.apply(node.action)
+            path.append(node)
+
+        # playout
+        if (sim.winner is None):
+            if (not sim.drawing):
+                _rollout_turn(sim)
+            for i in range(2 * ROLLOUT_TURNS):
+                if (not _rollout_turn(sim)):
+                    break
+        r = _reward(sim)
+
+        for node in path:
+            node.visits += 1
+            node.reward += r if node.mover == 0 else 1.0 - r
+
+    return dict((a, c.visits) for a, c in root.children.items()), n
+
+
+def _search_worker(info, drawing, playouts, seconds, seed, candidates):
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    return search(info, drawing, playouts, deadline, seed, None, candidates)
+
+
+_pool = None
+_pool_workers = 0
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    if (_pool is None or _pool_workers != workers):
+        if (_pool is not None):
+            _pool.shutdown()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def parallel_search(info, drawing, playouts=None, seconds=None, seed=0, workers=1, budget=None,
+                    candidates=None):
+    # root parallelization: sum the root counts of independent searches
+    if (workers <= 1):
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        return search(info, drawing, playouts, deadline, seed, budget, candidates)
+    share = None if playouts is None else -(-playouts // workers)
+    args = [(info, drawing, share, seconds, seed * workers + i, candidates) for i in range(workers)]
+    visits = {}
+    total = 0
+    for counts, n in _get_pool(workers).map(_search_worker, *zip(*args)):
+        for a, v in counts.items():
+            visits[a] = visits.get(a, 0) + v
+        total += n
+    return visits, total
+
+
+class ISMCTSMe(Me):
+    # search budget per decision when take_turn gets no deadline
+    playouts = PLAYOUTS
+    workers = 1
+
+    def __init__(self, deck, name, config=DEFAULT_TABLE):
+        if (not self.can_play(config)):
+            raise ValueError("ISMCTS plays two-seat tables without printed jokers")
+        self.rng = random.Random()
+        # (playouts, seconds) of every search, for playouts/s
+        self.search_stats = []
+        Me.__init__(self, deck, name, config)
+
+    @staticmethod
+    def can_play(config):
+        # the simulation has one opponent and knows no printed jokers
+        return config.players == 2 and not config.printed_jokers
+
+    def info_set(self, opendeck):
+        t = self.tracker
+        return InfoSet(self.cards, opendeck.cards, t.known_cards(), t.opp_size, t.unseen_cards(),
+                       self.wild_ranks)
+
+    def decide(self, info, drawing, budget, share, candidates=None):
+        seconds = None
+        playouts = self.playouts
+        if (budget is not None and budget.deadline is not None):
+            seconds = budget.remaining() * share
+            playouts = None
+        start = time.perf_counter()
+        visits, n = parallel_search(info, drawing, playouts, seconds, self.rng.getrandbits(32),
+                                    self.workers, budget, candidates)
+        self.search_stats.append((n, time.perf_counter() - start))
+        if (not visits):
+            return None
+        return max(sorted(visits), key=visits.get)
+
+    def take_turn(self, closedeck, opendeck, budget=None):
+        self.observe(closedeck, opendeck)
+
+        # draw: half of the time goes on choosing the pile
+        source = DRAW_CLOSED
+        if (opendeck.top_card() is not None):
+            source = self.decide(self.info_set(opendeck), True, budget, 0.5)
+        self.draw_from(closedeck, opendeck, source == DRAW_OPEN)
+
+        # throw: declare if I can, otherwise search the few throws that
+        # leave the least deadwood
+        ranked = self.rank_discards(self.cards)
+        throw_card = ranked[0][1]
+        if (ranked[0][0][0] and len(ranked) > 1):
+            candidates = [c % NUM_FACES for score, c in ranked[:CANDIDATES]]
+            face = self.decide(self.info_set(opendeck), False, budget, 1.0, candidates)
+            if (face is not None):
+                throw_card = next(c for c in self.cards if c % NUM_FACES == face)
+        return self.end_turn(closedeck, opendeck, throw_card)
+
+    def playout_rate(self):
+        playouts = sum(n for n, s in self.search_stats)
+        seconds = sum(s for n, s in self.search_stats)
+        return playouts / seconds if seconds else 0.0
+
+
+def main(argv=None):
+    from aiworker import Budget
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=1.0, help="time per turn")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    opendeck = Deck("od")
+    closedeck = DoubleDeck("cd", opendeck, rng)
+    closedeck.shuffle_cards()
+    player = ISMCTSMe(closedeck, "ismcts")
+    player.rng = rng
+    player.workers = args.workers
+    opponent = Me(closedeck, "greedy")
+    jokers = closedeck.draw_cards(2)
+    player.set_jokers(jokers)
+    opponent.set_jokers(jokers)
+    opendeck.add_card(closedeck.draw_card())
+
+    for turn in range(args.turns):
+        done, throw_card = player.take_turn(closedeck, opendeck, Budget(args.seconds))
+        opendeck.add_card(throw_card)
+        print("%s threw %s, %d points" % (player.name, card_str(throw_card), player.partition.points))
+        if (done):
+            break
+        done, throw_card = opponent.take_turn(closedeck, opendeck)
+        opendeck.add_card(throw_card)
+        if (done):
+            break
+    print("%.0f playouts/s with %d worker(s)" % (player.playout_rate(), args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Minimum-deadwood meld solver.
+
+solve_hand() splits a 13 or 14 card hand into pure sequences, impure
+sequences and sets so that the points left in unmelded cards (deadwood) are
+as small as possible.  Melds only count if the hand holds at least one pure
+sequence; otherwise every card is deadwood.
+
+Cards of a wild rank (the rank of a joker shown beside the closed deck) are
+jokers: they score 0, can stand in for any card, and still keep a sequence
+pure when they sit in their own place in it.  Printed jokers score 0 and
+stand in for any card, but have no place of their own.
+
+The search takes the lowest remaining card and tries every way it can be
+used: as deadwood, in a set of its rank, or in a run of its suit.  Natural
+cards are always preferred over jokers for the other places of a run, and
+results are memoized on the remaining hand.
+"""
+import runtable
+from rummycore import NUM_FACES, NUM_RANKS, PRINTED_JOKER, card_str
+
+# deadwood points by rank index (TWO .. ACE)
+RANK_POINTS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 10)
+
+MAX_MELD = 13
+
+# pool slot for jokers whose own place cannot help a pure sequence; the
+# pool keeps 2 bits per face below it
+GENERIC = NUM_FACES
+GENERIC_SHIFT = 2 * NUM_FACES
+
+INF = float("inf")
+
+
+def card_points(card):
+    if (card >= PRINTED_JOKER):
+        return 0
+    return RANK_POINTS[card % NUM_RANKS]
+
+
+def wild_ranks_of(jokers):
+    # rank indices made wild by the joker cards shown beside the closed
+    # deck; a printed joker shown there makes no rank wild
+    return tuple(set(j % NUM_RANKS for j in jokers if j < PRINTED_JOKER))
+
+
+def is_joker(card, wild):
+    # wild is the solver's mask of wild rank indices
+    return card >= PRINTED_JOKER or (wild >> (card % NUM_RANKS)) & 1
+
+
+class MeldPartition():
+    __slots__ = ("pure_seqs", "impure_seqs", "sets", "deadwood", "points", "jokers")
+
+    def __init__(self):
+        self.pure_seqs = []
+        self.impure_seqs = []
+        self.sets = []
+        self.deadwood = []
+        self.points = 0
+        self.jokers = []
+
+    def __repr__(self):
+        str_val = ""
+        for name, groups in (("pure", self.pure_seqs), ("impure", self.impure_seqs), ("set", self.sets)):
+            for g in groups:
+                str_val += name + "[" + " ".join(card_str(c) for c in g) + "] "
+        str_val += "deadwood[" + " ".join(card_str(c) for c in self.deadwood) + "] "
+        return str_val + "points=" + str(self.points)
+
+    def has_pure_seq(self):
+        return len(self.pure_seqs) > 0
+
+    def valid(self):
+        # a declare needs every card melded, a pure sequence and a second sequence
+        if (not self.pure_seqs or len(self.pure_seqs) + len(self.impure_seqs) < 2):
+            return False
+        for c in self.deadwood:
+            if (c not in self.jokers):
+                return False
+        return True
+
+
+def _face(suit, pos):
+    # run position 0 is the low ace, 1..13 are TWO .. ACE
+    return suit * NUM_RANKS + (NUM_RANKS - 1 if pos == 0 else pos - 1)
+
+
+# faces of a suit by run position
+_ROW_FACES = tuple(tuple(_face(s, q) for q in range(NUM_RANKS + 1)) for s in range(4))
+
+
+class _Solver():
+    # progress through the search is bit 0: a pure sequence is down, and
+    # above it the number of sequences, counted up to `seqs` when more than
+    # the pure one is needed
+    def __init__(self, seqs):
+        self.memo = {}
+        self.seqs = seqs
+        self.done = 1 if seqs == 1 else 1 | (seqs << 1)
+
+    def joker_choices(self, pool, k):
+        # distinct ways of taking k jokers out of the pool, as (pool, faces);
+        # generic jokers are never worse to give up, so they go first
+        if (k == 0):
+            return ((pool, ()),)
+        g = pool >> GENERIC_SHIFT
+        if (g >= k):
+            return ((pool - (k << GENERIC_SHIFT), (GENERIC,) * k),)
+        head = (GENERIC,) * g
+        return [(rest, head + used) for rest, used in self._joker_choices(pool - (g << GENERIC_SHIFT), k - g)]
+
+    def _joker_choices(self, pool, k):
+        if (k == 0):
+            yield pool, ()
+            return
+        seen = pool
+        while (seen):
+            f = ((seen & -seen).bit_length() - 1) >> 1
+            seen &= ~(3 << (2 * f))
+            for rest, used in self._joker_choices(pool - (1 << (2 * f)), k - 1):
+                if (not used or used[0] >= f):
+                    yield rest, (f,) + used
+
+    def advance(self, progress, is_pure):
+        if (self.seqs == 1):
+            return progress | is_pure
+        seqs = min((progress >> 1) + 1, self.seqs)
+        return (progress & 1) | is_pure | (seqs << 1)
+
+    def best(self, counts, pool, njokers, progress):
+        if (counts == 0):
+            return (0, None) if progress == self.done else (INF, None)
+        key = ((counts << 3 | progress) << 112) | pool
+        hit = self.memo.get(key)
+        if (hit is not None):
+            return hit
+
+        i = ((counts & -counts).bit_length() - 1) >> 1
+        one = 1 << (2 * i)
+        suit, rank = divmod(i, NUM_RANKS)
+
+        # the card is deadwood
+        cost, _ = self.best(counts - one, pool, njokers, progress)
+        result = (cost + RANK_POINTS[rank], ("dead", i))
+
+        # sets of its rank; a set never needs more jokers than it takes to
+        # reach three, and the card with two jokers is tried as a run below
+        others = []
+        for s in range(suit + 1, 4):
+            f = s * NUM_RANKS + rank
+            if ((counts >> (2 * f)) & 3):
+                others.append(f)
+        if (result[0] == 0):
+            others = []
+        for mask in range(1, 1 << len(others)):
+            faces = [i]
+            rest = counts - one
+            for b, f in enumerate(others):
+                if (mask >> b) & 1:
+                    faces.append(f)
+                    rest -= 1 << (2 * f)
+            k = max(0, 3 - len(faces))
+            if (k <= njokers):
+                for rest_pool, used in self.joker_choices(pool, k):
+                    cost, _ = self.best(rest, rest_pool, njokers - k, progress)
+                    if (cost < result[0]):
+                        result = (cost, ("set", tuple(faces), used))
+
+        # runs of its suit; a joker or wild card at either end of a run
+        # longer than three is better left unused, so those are skipped.
+        # Which runs there are comes from the suit's row of naturals
+        # (runtable); the row of cells is only made once one is tried
+        positions = (0, NUM_RANKS) if rank == NUM_RANKS - 1 else (rank + 1,)
+        if (result[0] == 0):
+            positions = ()
+        row = None
+        lonely = False
+        naturals = runtable.suit_row(counts, suit)
+        for p in positions:
+            if (njokers <= runtable.MAX_JOKERS):
+                windows = runtable.windows(naturals, p)
+            else:
+                windows = runtable.scan(naturals, p, njokers)
+            for a, b, need, check in windows:
+                if (need > njokers):
+                    continue
+                if (row is None):
+                    row = []
+                    for f in _ROW_FACES[suit]:
+                        if ((counts >> (2 * f)) & 3):
+                            row.append(("n", f))
+                        elif ((pool >> (2 * f)) & 3):
+                            row.append(("w", f))
+                        else:
+                            row.append(("j", f))
+                if (check & runtable.EDGE and row[a][0] == "j" and row[b + 1][0] == "j"):
+                    # same as the run shifted up by one place
+                    continue
+                if (check & runtable.LONELY and all(row[q][0] == "j" for q in range(a, b + 1) if q != p)):
+                    # the card with two jokers fits anywhere; try it once
+                    if (lonely):
+                        continue
+                    lonely = True
+                result = self.try_run(counts, pool, njokers, progress, tuple(row[a:b + 1]), result)
+
+        self.memo[key] = result
+        return result
+
+    def try_run(self, counts, pool, njokers, progress, cells, result):
+        rest = counts
+        rest_pool = pool
+        holes = 0
+        left = njokers
+        for kind, f in cells:
+            if (kind == "n"):
+                rest -= 1 << (2 * f)
+            elif (kind == "w"):
+                rest_pool -= 1 << (2 * f)
+                left -= 1
+            else:
+                holes += 1
+        is_pure = holes == 0
+        after = self.advance(progress, is_pure)
+        for rest_pool2, used in self.joker_choices(rest_pool, holes):
+            cost, _ = self.best(rest, rest_pool2, left - holes, after)
+            if (cost < result[0]):
+                result = (cost, ("run", cells, used, is_pure))
+        return result
+
+
+def _solve(cards, wild, seqs):
+    by_face = {}
+    counts = 0
+    pool = 0
+    njokers = 0
+    for c in cards:
+        if (c >= PRINTED_JOKER):
+            # a printed joker can only ever be a plain joker
+            by_face.setdefault(GENERIC, []).append(c)
+            pool += 1 << GENERIC_SHIFT
+            njokers += 1
+            continue
+        f = c % NUM_FACES
+        by_face.setdefault(f, []).append(c)
+        if (wild >> (f % NUM_RANKS)) & 1:
+            pool += 1 << (2 * f)
+            njokers += 1
+        else:
+            counts += 1 << (2 * f)
+
+    # wild cards with no card of their suit next to them can only ever be
+    # used as plain jokers
+    seen = pool & ((1 << GENERIC_SHIFT) - 1)
+    while (seen):
+        f = ((seen & -seen).bit_length() - 1) >> 1
+        seen &= ~(3 << (2 * f))
+        suit, rank = divmod(f, NUM_RANKS)
+        near = 0
+        for q in ((0, NUM_RANKS) if rank == NUM_RANKS - 1 else (rank + 1,)):
+            for nq in (q - 1, q + 1):
+                if (0 <= nq <= NUM_RANKS):
+                    near |= ((counts | pool) >> (2 * _face(suit, nq))) & 3
+        if (not near):
+            n = (pool >> (2 * f)) & 3
+            pool += (n << GENERIC_SHIFT) - (n << (2 * f))
+            by_face.setdefault(GENERIC, []).extend(by_face.pop(f))
+
+    part = MeldPartition()
+    part.jokers = [c for c in cards if is_joker(c, wild)]
+    solver = _Solver(seqs)
+    progress = 0
+    cost, move = solver.best(counts, pool, njokers, progress)
+
+    if (cost == INF):
+        # no pure sequence: nothing counts as melded
+        part.deadwood = list(cards)
+        part.points = sum(RANK_POINTS[c % NUM_RANKS] for c in cards if not is_joker(c, wild))
+        return part
+
+    def take(f):
+        return by_face[f].pop()
+
+    while (move is not None):
+        kind = move[0]
+        if (kind == "dead"):
+            f = move[1]
+            part.deadwood.append(take(f))
+            counts -= 1 << (2 * f)
+        elif (kind == "set"):
+            faces, used = move[1], move[2]
+            group = []
+            for f in faces:
+                group.append(take(f))
+                counts -= 1 << (2 * f)
+            for f in used:
+                group.append(take(f))
+                pool -= 1 << (2 * f)
+            njokers -= len(used)
+            part.sets.append(group)
+        else:
+            cells, used, is_pure = move[1], move[2], move[3]
+            group = []
+            k = 0
+            for kind, f in cells:
+                if (kind == "n"):
+                    group.append(take(f))
+                    counts -= 1 << (2 * f)
+                    continue
+                if (kind == "j"):
+                    f = used[k]
+                    k += 1
+                group.append(take(f))
+                pool -= 1 << (2 * f)
+                njokers -= 1
+            progress = solver.advance(progress, is_pure)
+            if (is_pure):
+                part.pure_seqs.append(group)
+            else:
+                part.impure_seqs.append(group)
+        move = solver.best(counts, pool, njokers, progress)[1]
+
+    # jokers nobody needed score nothing
+    for f in range(NUM_FACES + 1):
+        part.deadwood.extend(by_face.get(f, ()))
+    part.points = cost
+    return part
+
+
+def solve_hand(cards, wild_ranks=()):
+    wild = 0
+    for r in wild_ranks:
+        wild |= 1 << r
+    part = _solve(cards, wild, 1)
+    if (part.points == 0 and part.pure_seqs and not part.valid()):
+        # all melded but on one sequence: look for a layout with a second
+        # sequence so the hand can be declared
+        second = _solve(cards, wild, 2)
+        if (second.points == 0):
+            return second
+    return part
@@ -1,146 +1,97 @@
+import argparse
 import os
+import threading
+import time
 import pygame
 from pygame.locals import *
-from pygame.compat import geterror
-from enum import Enum
-from itertools import product
-import random
-from random import shuffle
-import operator
-
-if not pygame.font: print('Warning: fonts disabled')
-if not pygame.mixer: print('Warning: sound disabled')
-
+from rummycore import *
+import assetpack
+import gamelog
+import instrument
+from aiworker import AITurn
+from gamestate import GameState
+from handlayout import HandLayout
+from handcache import shared_cache
+from melds import wild_ranks_of
+
+# every position in the code is for a window of this size; View scales it
 screen_width = 900
 screen_height = 500
 
 
-class Suit(Enum):
-    CLUB = 1
-    DIAMOND = 2
-    HEART = 3
-    SPADE = 4
+class View():
+    # the scale of the window against screen_width x screen_height, and
+    # where the scaled table sits in it (centred, the rest left green)
+    def __init__(self):
+        self.scale = 1.0
+        self.ox = 0
+        self.oy = 0
 
-    def __lt__(self, other):
-        if not isinstance(other, Suit):
-            return NotImplemented
-        else:
-            return self.value < other.value
-
-
-class CardRank(Enum):
-    TWO = 2
-    THREE = 3
-    FOUR = 4
-    FIVE = 5
-    SIX = 6
-    SEVEN = 7
-    EIGHT = 8
-    NINE = 9
-    TEN = 10
-    JACK = 11
-    QUEEN = 12
-    KING = 13
-    ACE = 14
-
-    def __lt__(self, other):
-        if not isinstance(other, CardRank):
-            return NotImplemented
-        else:
-            return self.value < other.value
+    def resize(self, width, height):
+        self.scale = min(width / screen_width, height / screen_height)
+        self.ox = (width - round(screen_width * self.scale)) // 2
+        self.oy = (height - round(screen_height * self.scale)) // 2
 
-    def __sub__(self, other):
-        if not isinstance(other, CardRank):
-            return NotImplemented
-        else:
-            return self.value - other.value
+    def pos(self, x, y):
+        return self.ox + round(x * self.scale), self.oy + round(y * self.scale)
 
+    def length(self, n):
+        return max(1, round(n * self.scale))
 
-# joker ???
 
-class Card(pygame.sprite.Sprite):
-    offset = 20
+view = View()
 
-    def __init__(self, s, v):
-        pygame.sprite.Sprite.__init__(self)  # initialize sprite
-        self.suit = s
-        self.rank = v
 
-        # load image
-        if (self.rank.value <= 9):
-            filename = str(self.rank.value) + self.suit.name[0].lower() + ".gif"
-        else:
-            filename = str(self.rank.name[0].lower()) + self.suit.name[0].lower() + ".gif"
-        self.image, self.rect = load_image(filename, -1)
+class ScaledSprite(pygame.sprite.DirtySprite):
+    # an image placed at x, y of the unscaled window; rescale() fetches the
+    # image for the view's scale and puts the rect where it now belongs
+    def __init__(self, asset, x=0, y=0, rotation=0):
+        pygame.sprite.DirtySprite.__init__(self)
+        self.asset = asset
+        self.x, self.y = x, y
+        self.rotation = rotation
+        self.rescale()
 
-    def __str__(self):
-        return str(self.rank.name) + "_" + str(self.suit.name)
+    def get_image(self):
+        return scaled_image(self.asset, self.rotation)
 
-    def eq(self, other):
-        if not isinstance(other, Card):
-            return False
-        return self.suit == other.suit and self.rank == other.rank
+    def rescale(self):
+        self.image = self.get_image()
+        self.rect = self.image.get_rect(topleft=view.pos(self.x, self.y))
+        self.dirty = 1
 
-    def __sub__(self, other):
-        if not isinstance(other, Card):
-            return NotImplemented
-        else:
-            return self.rank - other.rank
+    def place(self, x, y):
+        self.x, self.y = x, y
+        self.rect.topleft = view.pos(x, y)
+        self.dirty = 1
 
 
-class Deck(pygame.sprite.Sprite):
-    def __init__(self, name, image_file, x, y):
-        pygame.sprite.Sprite.__init__(self)
-        self.cards = []
-        self.name = name
-        self.image, self.rect = load_image(image_file, -1)
-        self.rect.x = x
-        self.rect.y = y
-
-    def __str__(self):
-        str_val = self.name + "(" + str(len(self.cards)) + "): "
-        for c in self.cards:
-            str_val = str_val + str(c) + " "
-        return str_val
-
-    def load_image(self, filename):
-        # load image
-        self.image, self.rect = load_image(filename, -1)
-
-    def deck_size(self):
-        return len(self.cards)
+class CardSprite(ScaledSprite):
+    # a card on screen: its own rect, the face's shared surface
+    offset = 20
 
-    def shuffle_cards(self):
-        shuffle(self.cards)
+    def __init__(self, card, rotation=0):
+        self.card = card
+        ScaledSprite.__init__(self, card_filename(card), rotation=rotation)
 
-    def draw_cards(self, n):
-        hand = []
-        assert (n > 0)
-        i = 0
-        while (i < n):
-            hand.append(self.cards[0])
-            self.cards.pop(0)
-            i += 1
-        return hand
+    def get_image(self):
+        if (self.rotation):
+            return scaled_image(self.asset, self.rotation)
+        return card_image(self.card)
 
-    def add_card(self, card):
-        self.cards.insert(self, 0, card)
+    def __str__(self):
+        return card_str(self.card)
 
 
-class DoubleDeck(Deck):
-    def __init__(self, name, image_file, x, y):
-        Deck.__init__(self, name, image_file, x, y)
-        for i in range(2):
-            for s, v in product(Suit, CardRank):
-                self.cards.append(Card(s, v))
+class DeckSprite(ScaledSprite):
+    def load_image(self, filename):
+        # load image
+        self.asset = filename
+        self.rescale()
 
 
-class Button(pygame.sprite.Sprite):
-    def __init__(self, image_file, x, y):
-        pygame.sprite.Sprite.__init__(self)
-        self.image, self.rect = load_image(image_file, -1)
-        self.rect.x = x
-        self.rect.y = y
+class Button(ScaledSprite):
+    pass
 
 
 class GroupButton(Button):
@@ -153,223 +104,96 @@ class GroupButton(Button):
             self.grey = False
             # make button green
             green_color = 0, 150, 0
-            self.image, self.rect = load_image("group.gif", -1)
+            self.asset = "group.gif"
         else:
             self.grey = True
             # restore grey button
             grey_color = 85, 85, 85
-            self.image, self.rect = load_image("groupgrey.gif", -1)
-        self.rect.x, self.rect.y = screen_width - 125, screen_height - 250
+            self.asset = "groupgrey.gif"
+        self.rescale()
 
-    def clicked_in(self):
-        if (self.rect.collidepoint(pygame.mouse.get_pos())):
+    def clicked_in(self, pos=None):
+        if (pos is None):
+            pos = pygame.mouse.get_pos()
+        if (self.rect.collidepoint(pos)):
             return True
         else:
             return False
 
 
-class CGroupType():
-    PURE_SEQ = 1
-    IMPURE_SEQ = 2
-    SET = 3
-    UNKNOWN = 4
-
-
-class CGroupStatus():
-    INCOMPLETE = 1
-    COMPLETE = 2
-
-
-class CGroup():
-    maxsize = 4
-
-    def __init__(self, type):
-        self.cards = []
-        self.type = type
-        self.status = CGroupStatus.INCOMPLETE
-
-    def append(self, card):
-        # if (len(self.cards) == self.maxsize):
-        #    return False
-        # else:
-        self.cards.append(card)
-        # if (len(self.cards) == self.maxsize):
-        #    self.status = CGroupStatus.COMPLETE
-        # return True
-
-    def prepend(self, card):
-        # if (len(self.cards) == self.maxsize):
-        #    return False
-        # else:
-        self.cards.insert(0, card)
-
-    #    if (len(self.cards) == self.maxsize):
-    #        self.status = CGroupStatus.COMPLETE
-    #    return True
-
-    def __repr__(self):
-        str_val = "["
-        for c in self.cards:
-            str_val += str(c) + " "
-        str_val += "]"
-        return str_val
-
-    def size(self):
-        return len(self.cards)
-
-
-class Player():
-    def __init__(self, deck, name):
-        self.turn = False
+class ThinkingSprite(pygame.sprite.DirtySprite):
+    # "Me is thinking..." beside the hand while the AI takes its turn
+    def __init__(self, name, x, y):
+        pygame.sprite.DirtySprite.__init__(self)
         self.name = name
-        self.cardgroups = []
-        # get a hand
-        self.cards = deck.draw_cards(13)
-        new_group = CGroup(CGroupType.UNKNOWN)
-        new_group.cards = self.cards
-        self.cardgroups.append(new_group)
-
-    def __str__(self):
-        str_val = self.name + ": "
-        for cg in self.cardgroups:
-            for c in cg.cards:
-                str_val = str_val + str(c) + " "
-        return str_val
-
-    def swap_cards(self, ix1, ix2):
-        self.cards[ix1], self.cards[ix2] = self.cards[ix2], self.cards[ix1]
-
-
-class Me(Player):
-
-    # set some flags: have_4, have_pure_seq
-
-    def __init__(self, deck, name):
-        Player.__init__(self, deck, name)
-        self.groups_ready = []
-        self.groups_in_progress = []
-        self.loose_cards = []
-        self.jokers = []
-        self.have_pure_seq = False
-
-        # arrange cards by color and number
-        self.cards.sort(key=operator.attrgetter("suit", "rank"))
-
-        # make groups
-        self.make_groups()
-
-        # update groups with joker
-        for j in self.jokers:
-            self.update_groups(j)
-
-    def make_groups(self):
-        # iterate over all elements and group into pure sequences
-        for cur_card in self.cards:
-            # if cur_card is joker, add it to self.jokers
-
-            if (self.cards.index(cur_card) == 0):
-                new_group = CGroup(CGroupType.PURE_SEQ)
-                new_group.append(cur_card)
-            else:
-                prev_card = self.cards[self.cards.index(cur_card) - 1]
-                if (prev_card.suit == cur_card.suit):
-                    if (cur_card.rank - prev_card.rank != 1):
-                        self.cardgroups.append(new_group)
-                        new_group = CGroup(CGroupType.PURE_SEQ)
-                    if (not new_group.append(cur_card)):
-                        CGroup.maxsize = 3  # one pure sequence has been made
-                        self.have_pure_seq = True
-                        new_group = CGroup(CGroupType.PURE_SEQ)
-                        new_group.append(cur_card)
-
-        # append last group
-        self.cardgroups.append(new_group)
-
-        # iterate over loose cards, and try to make sets
-
-        # for each card in the joker list, call update_groups(card, true)
-
-        print(self.cardgroups)
-
-    def update_groups(self, card, isjoker=False):
-        """
-        for each group:
-            try_to_add_card(group, card, isJoker)
-
-        """
-
-    def take_turn(self, closedeck, opendeck):
-        if (opendeck.deck_size()):
-            new_card = opendeck[len(opendeck) - 1]
-            ret_val, throw_card = check(new_card)
-            if (ret_val or throw_card):
-                return ret_val, throw_card
-
-        # get new card
-        new_card = closedeck.draw_cards(1)
-
-        # do I want this card?
-
-    def try_to_add_card(self, group, card, isJoker):
-        if (group.type == CGroupType.SET):
-            try_to_add_card_to_set(group, card, isJoker)
+        self.dots = -1
+        self.x, self.y = x, y
+        self.text = ""
+        self.rescale()
+        self.visible = 0
+
+    def rescale(self):
+        # the font is only made once there is something to say
+        self.font = None
+        self.rect = None
+        self.render(self.text)
+
+    def render(self, text):
+        self.text = text
+        if (text and self.font is None):
+            self.font = get_font(view.length(28))
+        if (text and self.font):
+            self.image = self.font.render(text, True, (255, 255, 255), (0, 150, 0))
         else:
-            try_to_add_card_to_seq(group, card, isJoker)
+            self.image = pygame.Surface((1, 1))
+        # keep the old width so shorter text paints over longer text
+        width = self.image.get_width()
+        if (self.rect is not None):
+            width = max(width, self.rect.width)
+        self.rect = pygame.Rect(view.pos(self.x, self.y), (width, self.image.get_height()))
+        self.dirty = 1
+
+    def show(self, on):
+        if (bool(self.visible) != on):
+            self.visible = 1 if on else 0
+            self.dots = -1
+            self.dirty = 1
 
-    def try_to_add_card_to_seq(self, group, card, isJoker):
-        # try to add non-joker card to a complete seq
-        if (group.status == CGroupStatus.COMPLETE):
-            if (group.type == CGroupType.PURE_SEQ or isJoker):
-                return
-            else:
-                # look for joker and try to replace with true match
-                for c in group.cards:
-                    if (c == joker):
-                        if (group.cards.index(c) == 0):
-                            next_card = group.cards[group.cards.index(c) + 1]
-                            if (next_card.rank - card.rank == 1):
-                                group.cards[group.cards.index(c)] = card
-                                # check and reset group type ???
-                                return c
-                        else:
-                            prev_card = group.cards[group.cards.index(c) - 1]
-                            if (card.rank - prev_card.rank == 1):
-                                group.cards[group.cards.index(c)] = card
-                                # check and reset group type ???
-                                return c
-        else:
-            if (card is joker):
-                group.append(card)
-                group.type = CGroupType.IMPURE_SEQ
-            else:
-                if (card.rank() - group.cards[0].rank() == 1):
-                    group.cards.prepend(card)
-                    # check and reset group type ???
-                elif (group.cards[-1].rank - card.rank() == 1):
-                    group.cards.append(card)
-                    # check and reset group type ???
-
-    def try_to_add_card_to_set(self, group, card, isJoker):
-        pass
+    def update(self):
+        # cycle the dots a few times a second
+        if (self.visible):
+            dots = int(time.perf_counter() * 3) % 4
+            if (dots != self.dots):
+                self.dots = dots
+                self.render(self.name + " is thinking" + "." * dots)
 
 
 class You(Player):
-    def __init__(self, deck, name):
-        Player.__init__(self, deck, name)
+    def __init__(self, deck, name, hand_size=HAND_SIZE):
+        Player.__init__(self, deck, name, hand_size)
+        self.hand_size = hand_size
+        # sprites for the cards on screen, keyed by card
+        self.sprites = {}
+        for c in self.cards:
+            self.sprites[c] = CardSprite(c)
+        # where each card is; groupings are applied to it as edits, which
+        # keeps the sprites and the hit index up to date
+        self.layout = HandLayout(0, 0, 0, 0, self.sprites, CardSprite)
+        self.rescale()
 
     def pick_card(self, deck):
         # get new card
-        return deck.draw_cards(1)
+        return deck.draw_card()
 
     def add_card(self, ix, card):
-        if (len(self.cards) > 13):
+        if (len(self.cards) > self.hand_size):
             return False
         else:
             self.cards.insert(ix, card)
             return True
 
     def rem_card(self, ix):
-        if (len(self.cards) < 13):
+        if (len(self.cards) < self.hand_size):
             return False, None
         else:
             return True, self.cards.pop(ix)
@@ -377,78 +201,86 @@ class You(Player):
     def throw_card(self, deck, card):
         deck.add_card(card)
 
-    def reassign_card_locations(self):
-        xpos = 10
-        ypos = screen_height - 150
-        for cg in self.cardgroups:
-            assign_cards_location(cg.cards, xpos, ypos)
-            xpos = cg.cards[-1].rect.right + 60
+    def rescale(self):
+        # new images for the view's scale, and the hand laid out again
+        for sprite in self.sprites.values():
+            sprite.rescale()
+        self.layout.x, self.layout.y = view.pos(10, screen_height - 150)
+        self.layout.offset = view.length(CardSprite.offset)
+        self.layout.gap = view.length(60)
+        self.reassign_card_locations()
+
+    def reassign_card_locations(self, xpos=None):
+        # lay the whole hand out again, e.g. after cardgroups was replaced
+        self.layout.reset([cg.cards for cg in self.cardgroups], xpos)
 
     def get_all_cards(self):
         all_cards = []
         for cg in self.cardgroups:
-            all_cards.append(cg.cards)
+            for c in cg.cards:
+                all_cards.append(self.sprites[c])
         return all_cards
 
     def make_group(self, card_indices):
+        # card_indices is group, card, group, card, ...; only the groups
+        # the cards come from and the ones to their right move
         new_group = CGroup(CGroupType.UNKNOWN)
-        for i in range(0, len(card_indices), 2):
-            gix = card_indices[i]
-            cix = card_indices[i + 1]
-            new_group.append(self.cardgroups[gix].cards[cix])
-        for i in range(0, len(card_indices), 2):
-            gix = card_indices[i]
-            cix = card_indices[i + 1]
-            self.cardgroups[gix].cards.pop(cix)
-
+        picked = list(zip(card_indices[0::2], card_indices[1::2]))
+        self.layout.group(picked, new_group.cards)
         self.cardgroups.append(new_group)
-        self.reassign_card_locations()
-
-    def clicked_in_group(self, cg):
-        return_val = False
-        mouse_pos = pygame.mouse.get_pos()
-        i = -1
-        group_rect = pygame.Rect(cg.cards[0].rect.x, cg.cards[0].rect.y, cg.cards[-1].rect.right - cg.cards[0].rect.x,
-                                 cg.cards[-1].rect.bottom - cg.cards[0].rect.y)
-        if (group_rect.collidepoint(mouse_pos)):
-            return_val = True
-            for c in cg.cards:
-                i += 1
-                c_rect = pygame.Rect(c.rect.x, c.rect.y, c.offset, c.rect.bottom - c.rect.top)
-                if (c_rect.collidepoint(mouse_pos)):
-                    break
-        return return_val, i
 
-    def clicked_in_hand(self):
-        return_val = False
-        mouse_pos = pygame.mouse.get_pos()
-        i = -1
-        j = -1
-        for cg in self.cardgroups:
-            i += 1
-            return_val, j = self.clicked_in_group(cg)
-            if return_val:
-                break
-        return return_val, i, j
+    @instrument.timed("hit_test")
+    def clicked_in_hand(self, pos=None):
+        if (pos is None):
+            pos = pygame.mouse.get_pos()
+        hit = self.layout.hit(pos[0], pos[1])
+        if (hit is None):
+            return False, -1, -1
+        return True, hit[0], hit[1]
 
 
 main_dir = os.path.split(os.path.abspath(__file__))[0]
 data_dir = os.path.join(main_dir, "data")
 
 
+# decoded surfaces shared by every sprite showing the same image
+image_cache = {}
+asset_pack = None
+# images decoded ahead of need by prefetch_images(), by name; they are
+# converted for the screen (on the main thread) when first used
+prefetched = {}
+
+
+@instrument.timed("load_image")
 def load_image(name, colorkey=None):
-    fullname = os.path.join(data_dir, name)
-    try:
-        image = pygame.image.load(fullname)
-    except pygame.error:
-        print('Cannot load image:', fullname)
-        raise SystemExit(str(geterror()))
+    global asset_pack
+    key = (name, colorkey)
+    image = image_cache.get(key)
+    if image is not None:
+        return image, image.get_rect()
+
+    if asset_pack is None:
+        # one read for all the images, if the pack has been built
+        pack_file = os.path.join(data_dir, assetpack.PACK_NAME)
+        asset_pack = assetpack.load_pack(pack_file) if os.path.exists(pack_file) else {}
+    if name in asset_pack:
+        image = asset_pack[name]
+    elif name in prefetched:
+        image = prefetched.pop(name)
+    else:
+        fullname = os.path.join(data_dir, name)
+        try:
+            image = pygame.image.load(fullname)
+        except pygame.error as e:
+            print('Cannot load image:', fullname)
+            raise SystemExit(str(e))
     image = image.convert()
     if colorkey is not None:
-        if colorkey is -1:
+        if colorkey == -1:
             colorkey = image.get_at((0, 0))
             image.set_colorkey(colorkey, RLEACCEL)
-        return image, image.get_rect()
+    image_cache[key] = image
+    return image, image.get_rect()
 
 
 """
@@ -467,73 +299,306 @@ def load_sound(name):
     return sound"""
 
 
-def assign_cards_location(cardslist, xpos, ypos):
-    for c in cardslist:
-        c.rect.x, c.rect.y = xpos, ypos
-        xpos += Card.offset
-
+def prefetch_images(names):
+    # decode the images not used yet on a background thread, so the first
+    # card drawn later does not stall a frame; the asset pack has them all
+    # in memory already
+    if asset_pack:
+        return None
+
+    def run():
+        for name in names:
+            if (name, -1) not in image_cache and name not in prefetched:
+                try:
+                    prefetched[name] = pygame.image.load(os.path.join(data_dir, name))
+                except pygame.error:
+                    pass
+
+    thread = threading.Thread(target=run, name="prefetch", daemon=True)
+    thread.start()
+    return thread
+
+
+fonts = {}
+
+
+def get_font(size):
+    # the default font at size; the font module is started the first time
+    if not pygame.font:
+        return None
+    if not pygame.font.get_init():
+        pygame.font.init()
+    font = fonts.get(size)
+    if font is None:
+        font = fonts[size] = pygame.font.Font(None, size)
+    return font
+
+
+# images as drawn: (name, scale, rotation) -> surface, made from the
+# decoded image the first time it is asked for and dropped when the window
+# is resized, so nothing is scaled or rotated while drawing frames
+scaled_cache = {}
+
+
+def scaled_image(name, rotation=0):
+    key = (name, view.scale, rotation)
+    image = scaled_cache.get(key)
+    if image is None:
+        image = load_image(name, -1)[0]
+        if (rotation):
+            image = pygame.transform.rotate(image, rotation)
+        if (view.scale != 1.0):
+            size = (view.length(image.get_width()), view.length(image.get_height()))
+            image = pygame.transform.scale(image, size)
+        scaled_cache[key] = image
+    return image
+
+
+# one surface per face at the current scale (the printed jokers share the
+# last), for every copy and every sprite that shows it
+face_images = [None] * (JOKER_FACE + 1)
+
+
+def card_image(card):
+    image = face_images[card_face(card)]
+    if image is None:
+        image = face_images[card_face(card)] = scaled_image(card_filename(card))
+    return image
+
+
+def set_scale(width, height):
+    # the window is width x height now; images are made again as needed
+    view.resize(width, height)
+    scaled_cache.clear()
+    face_images[:] = [None] * (JOKER_FACE + 1)
+
+
+class FrameStats():
+    # frame times and CPU use of the main loop, printed on exit
+    def __init__(self):
+        self.frame_times = []
+        self.loops = 0
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def add(self, seconds):
+        self.frame_times.append(seconds)
+
+    def report(self):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        times = sorted(self.frame_times)
+        n = len(times)
+        if (n == 0):
+            return
+        print("%d loops, %d frames drawn in %.1f s" % (self.loops, n, wall))
+        print("frame time: mean %.2f ms, p99 %.2f ms" % (sum(times) / n * 1000, times[n * 99 // 100] * 1000))
+        print("CPU: %.1f%% of one core" % (100.0 * cpu / wall))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rummy")
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="repaint the whole window every frame at 60 fps")
+    parser.add_argument("--measure", action="store_true",
+                        help="print frame times and CPU use on exit")
+    parser.add_argument("--think-time", type=float, default=2.0,
+                        help="seconds the computer may think per turn")
+    parser.add_argument("--ai", choices=("ismcts", "greedy"), default="ismcts",
+                        help="search the game tree or just keep the least deadwood")
+    parser.add_argument("--ai-workers", type=int, default=1,
+                        help="processes the tree search may use")
+    parser.add_argument("--players", type=int, default=2,
+                        help="2 to 6; the computer plays every seat but yours")
+    parser.add_argument("--decks", type=int, default=2, help="decks shuffled together, 1 to 3")
+    parser.add_argument("--printed-jokers", action="store_true",
+                        help="play the decks' printed jokers too (needs data/joker.gif)")
+    parser.add_argument("--log", metavar="FILE",
+                        help="append the game to a binary game log")
+    parser.add_argument("--size", default="%dx%d" % (screen_width, screen_height), metavar="WxH",
+                        help="starting window size; the window can be resized")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="decode the card faces not on screen yet in the background after the first frame")
+    parser.add_argument("--instrument", action="store_true",
+                        help="time image loading, grouping, hit tests, AI turns and frames; print on exit")
+    parser.add_argument("--instrument-every", type=float, metavar="SECONDS",
+                        help="also print the timings every so many seconds")
+    parser.add_argument("--profile-frames", type=int, metavar="N",
+                        help="cProfile the next N frames into frame.prof")
+    parser.add_argument("--profile-turns", type=int, metavar="N",
+                        help="cProfile the next N AI turns into turn.prof")
+    args = parser.parse_args(argv)
+    try:
+        config = TableConfig(args.players, args.decks, args.printed_jokers)
+    except ValueError as e:
+        parser.error(str(e))
+    if (args.ai == "ismcts"):
+        from ismcts import ISMCTSMe
+    if (args.ai == "ismcts" and not ISMCTSMe.can_play(config)):
+        parser.error("--ai ismcts plays two players without printed jokers; try --ai greedy")
+    if (args.instrument or args.instrument_every):
+        instrument.enable(dump_every=args.instrument_every)
+    if (args.profile_frames):
+        instrument.capture("frame", args.profile_frames)
+    if (args.profile_turns):
+        instrument.capture("turn", args.profile_turns)
 
-def main():
     # initialize
 
-    pygame.init()
-    screen = pygame.display.set_mode((screen_width, screen_height))
+    # only the display; fonts start when there is text to draw, and sound
+    # is never used, so the audio device is not opened
+    pygame.display.init()
+    if not pygame.font: print('Warning: fonts disabled')
+    width, height = (int(n) for n in args.size.lower().split("x"))
+    screen = pygame.display.set_mode((width, height), RESIZABLE)
     pygame.display.set_caption('Rummy')
     pygame.mouse.set_visible(1)
+    set_scale(width, height)
 
     # create background
-    background = pygame.Surface(screen.get_size())
-    background = background.convert()
-    background.fill((0, 150, 0))
+    def make_background():
+        background = pygame.Surface(screen.get_size())
+        background = background.convert()
+        background.fill((0, 150, 0))
+        return background
+
+    background = make_background()
 
     # initialize objects
     stop_button = Button("stop.gif", screen_width - 100, screen_height - 450)
     print(stop_button.rect)
     declare_button = Button("declare.gif", screen_width - 125, screen_height - 350)
     group_button = GroupButton(screen_width - 125, screen_height - 250)
+    ai_done_event = pygame.event.custom_type()
 
-    closedeck = DoubleDeck("cd", "b.gif", screen_width - 800, screen_height - 450)
+    opendeck = Deck("od")
+    opendeck_sprite = DeckSprite("holder.jpg", screen_width - 400, screen_height - 450)
+
+    closedeck = TableDeck("cd", config, opendeck)
     closedeck.shuffle_cards()
+    closedeck_sprite = DeckSprite("b.gif", screen_width - 800, screen_height - 450)
     print(closedeck)
-
-    opendeck = Deck("od", "holder.jpg", screen_width - 400, screen_height - 450)
     print(opendeck)
 
-    temphold = Deck("th", "holder.jpg", screen_width - 600, screen_height - 300)
-
-    me = Me(closedeck, "Me")
-    print(me)
+    temphold = Deck("th")
+    temphold_sprite = DeckSprite("holder.jpg", screen_width - 600, screen_height - 300)
 
-    user = You(closedeck, "User")
+    # the computer takes every seat but the last, which is the user's
+    ais = []
+    for seat in range(config.players - 1):
+        name = "Me" if config.players == 2 else "Me%d" % (seat + 1)
+        if (args.ai == "ismcts"):
+            ai = ISMCTSMe(closedeck, name, config)
+            ai.workers = args.ai_workers
+        else:
+            ai = Me(closedeck, name, config)
+        print(ai)
+        ais.append(ai)
+    me = ais[0]
+    user_seat = len(ais)
+    thinking = ThinkingSprite(me.name, screen_width - 400, screen_height - 330)
+
+    user = You(closedeck, "User", config.hand_size)
     print(user)
 
     print(closedeck.deck_size())
 
     # draw jokers
-    joker1 = closedeck.draw_cards(1)
-    joker1[0].image = pygame.transform.rotate(joker1[0].image, 90)
-    joker1[0].rect.x, joker1[0].rect.y = closedeck.rect.x - 30, closedeck.rect.y + 26
-    print("joker1: " + str(joker1[0]))
-    joker2 = closedeck.draw_cards(1)
-    joker2[0].image = pygame.transform.rotate(joker2[0].image, 90)
-    joker2[0].rect.x, joker2[0].rect.y = closedeck.rect.x - 30, closedeck.rect.y + 6
-    print("joker2: " + str(joker2[0]))
+    joker1 = CardSprite(closedeck.draw_card(), rotation=90)
+    joker1.place(closedeck_sprite.x - 30, closedeck_sprite.y + 26)
+    print("joker1: " + str(joker1))
+    joker2 = CardSprite(closedeck.draw_card(), rotation=90)
+    joker2.place(closedeck_sprite.x - 30, closedeck_sprite.y + 6)
+    print("joker2: " + str(joker2))
     print(closedeck.deck_size())
+    jokers = (joker1.card, joker2.card)
+
+    # create sprite groups; the hand is drawn over the table
+    all_sprites = pygame.sprite.LayeredDirty((stop_button, declare_button, joker1, joker2,
+                                              closedeck_sprite, opendeck_sprite, temphold_sprite, group_button,
+                                              thinking))
+
+    # the hand was laid out when it was dealt; add it to the hand layer
+    user.layout.attach(all_sprites, layer=1)
+    all_sprites.clear(screen, background)
+
+    # the table as it stands (the computer in the first seats, the user in
+    # the last), and the states to go back to with ctrl-z
+    state = GameState.from_table(closedeck, opendeck, ais + [user], jokers, wild_ranks_of(jokers),
+                                 turn=user_seat)
+    undo = []
+
+    # the game log, written as the game goes
+    log_writer = gamelog.GameLogWriter(args.log) if args.log else None
+    record = None
+    if (log_writer):
+        record = log_writer.start(config.players)
+        for seat, ai in enumerate(ais):
+            record.deal(seat, ai.cards)
+        record.deal(user_seat, [c for cg in user.cardgroups for c in cg.cards])
+        record.joker(joker1.card)
+        record.joker(joker2.card)
+
+    def log_groups():
+        # the group of every card in the user's hand
+        if (record):
+            for gix, cg in enumerate(user.cardgroups):
+                for c in cg.cards:
+                    record.group(user_seat, c, gix)
+
+    def draw_frame():
+        start = time.perf_counter()
+        with instrument.timer("frame"):
+            if (args.full_redraw):
+                screen.blit(background, (0, 0))
+                for s in all_sprites.sprites():
+                    screen.blit(s.image, s.rect)
+                pygame.display.flip()
+            else:
+                # repaint only what moved or changed
+                pygame.display.update(all_sprites.draw(screen))
+        if (stats):
+            stats.add(time.perf_counter() - start)
+
+    def resize(width, height):
+        # everything is scaled once here, never while drawing frames
+        nonlocal screen, background
+        screen = pygame.display.get_surface()
+        set_scale(width, height)
+        background = make_background()
+        for s in all_sprites.get_sprites_from_layer(0):
+            s.rescale()
+        user.rescale()
+        all_sprites.clear(screen, background)
+        screen.blit(background, (0, 0))
+        pygame.display.flip()
 
-    # create sprite groups
-    non_changing_sprites = pygame.sprite.Group((stop_button, declare_button, joker1[0], joker2[0]))
-    changing_sprites = pygame.sprite.Group(closedeck, opendeck, temphold, group_button)
-
-    # assign location to each user card and add to changing_sprites group
-    assign_cards_location(user.cards, screen_width - 700, screen_height - 150)
-    hand_sprite = pygame.sprite.Group(user.cards)
+    def next_events(busy=False):
+        if (busy or args.full_redraw or any(s.dirty for s in all_sprites)):
+            # 60 frames per sec
+            clock.tick(60)
+            events = pygame.event.get()
+        else:
+            # nothing to repaint: sleep until something happens
+            events = [pygame.event.wait()] + pygame.event.get()
+        for event in events:
+            if (event.type == VIDEORESIZE):
+                resize(event.w, event.h)
+        return events
 
     # display the background and sprites
+    stats = FrameStats() if args.measure else None
     screen.blit(background, (0, 0))
-    non_changing_sprites.draw(screen)
-    changing_sprites.draw(screen)
-    hand_sprite.draw(screen)
     pygame.display.flip()
+    draw_frame()
+    # the computer groups its hand once the window is up: the first solve
+    # loads the run table, which would otherwise be most of the start-up
+    for ai in ais:
+        ai.set_jokers(jokers)
+    print(me)
+    if (args.prefetch):
+        faces = list(range(NUM_FACES)) + ([PRINTED_JOKER] if config.printed_jokers else [])
+        prefetch_images([card_filename(c) for c in faces])
 
     clock = pygame.time.Clock()
 
@@ -548,18 +613,32 @@ def main():
     cards_to_group = []
     group_enabled = False
     selected_card = None
+    ai_turn = None
+    ai_seat = 0
+    winner = None
+
+    def turn_over(player):
+        # with more than one computer player, each one is shown the start
+        # of the game (player None) and every turn of the others
+        if (len(ais) > 1):
+            for ai in ais:
+                if (ai is not player):
+                    ai.watch(closedeck, opendeck)
+
+    turn_over(None)
     while going:
-        # 60 frames per sec
-        clock.tick(60)
+        if (stats):
+            stats.loops += 1
+        instrument.profile_begin("frame")
 
         # handle events
         if (user.turn):
-            for event in pygame.event.get():
+            for event in next_events():
                 if event.type == QUIT:
                     # do you really want to exit?
                     going = False
                 elif event.type == MOUSEBUTTONDOWN:
-                    clicked_hand, group_ix, card_ix = user.clicked_in_hand()
+                    clicked_hand, group_ix, card_ix = user.clicked_in_hand(event.pos)
                     if (clicked_hand):
                         print("Clicked card %d,%d" % (group_ix, card_ix))
                         if (new_card):
@@ -581,12 +660,14 @@ def main():
                                 group_button.update()
                             cards_to_group.append(group_ix)
                             cards_to_group.append(card_ix)
-                    elif (group_button.clicked_in()):
+                    elif (group_button.clicked_in(event.pos)):
                         if (group_enabled):
                             # redraw cards grouping selected cards
+                            # moved cards are marked dirty and repainted
+                            undo.append(state)
                             user.make_group(cards_to_group)
-                            hand_sprite.empty()
-                            hand_sprite.add(user.get_all_cards())
+                            state = state.regroup(user_seat, [cg.cards for cg in user.cardgroups])
+                            log_groups()
                     elif (group_enabled):
                         group_enabled = False
                         cards_to_group.clear()
@@ -633,33 +714,78 @@ def main():
                             opendeck.add_card(new_card)
                             temp_hold_card_full = False
                             you.turn = False"""
+                elif event.type == KEYDOWN and event.key == K_z and event.mod & KMOD_CTRL:
+                    # undo the last grouping
+                    if (undo):
+                        state = undo.pop()
+                        state.restore_hand(user, user_seat)
+                        user.reassign_card_locations()
+                        log_groups()
+                        cards_to_group.clear()
+                        if (group_enabled):
+                            group_enabled = False
+                            group_button.update()
                 elif event.type == MOUSEBUTTONUP:
-                    if (group_button.clicked_in()):
+                    if (group_button.clicked_in(event.pos)):
                         if (group_enabled):
                             group_enabled = False
                             cards_to_group.clear()
                             # grey out group button
                             group_button.update()
         else:
-            # draw card from closedeck or opendeck
-            done, throw_card = me.take_turn(closedeck, opendeck)
-            if (done):
-                # calculate points
-                print("victory")
-                # display hand
-                # game over!
-            else:
-                # add throw_card to discard_deck
-                user.turn = True
+            ai = ais[ai_seat]
+            if (ai_turn is None):
+                # think in the background; the worker wakes us when done
+                ai_turn = AITurn(ai, closedeck, opendeck, args.think_time,
+                                 lambda: pygame.event.post(pygame.event.Event(ai_done_event)))
+                thinking.name = ai.name
+                thinking.show(True)
+            for event in next_events(busy=True):
+                if event.type == QUIT:
+                    going = False
+                    ai_turn.cancel()
+                elif event.type == ai_done_event:
+                    # draw card from closedeck or opendeck
+                    done, throw_card = ai_turn.get()
+                    ai_turn = None
+                    thinking.show(False)
+                    if (record):
+                        record.draw(ai_seat, *ai.last_draw)
+                        record.discard(ai_seat, throw_card)
+                        log_writer.flush()
+                    if (done):
+                        winner = ai_seat
+                        if (record):
+                            record.declare(ai_seat, True)
+                        # calculate points
+                        hand = [c for cg in user.cardgroups for c in cg.cards]
+                        print("victory, user points: %d" % shared_cache.points(hand, me.wild_ranks))
+                        # display hand
+                        # game over!
+                    else:
+                        # add throw_card to discard_deck
+                        opendeck.add_card(throw_card)
+                        turn_over(ai)
+                        ai_seat = config.next_seat(ai_seat)
+                        if (ai_seat == user_seat):
+                            ai_seat = 0
+                            user.turn = True
+                    break
+            thinking.update()
 
-        # draw everything
-        screen.blit(background, (0, 0))
-        non_changing_sprites.draw(screen)
-        changing_sprites.draw(screen)
-        hand_sprite.draw(screen)
-        pygame.display.flip()
+        # draw everything that changed
+        draw_frame()
+        instrument.profile_end("frame")
+        instrument.tick()
 
     # game over
+    if (log_writer):
+        hand = [c for cg in user.cardgroups for c in cg.cards]
+        record.end(winner, [0 if winner == seat else ai.partition.points for seat, ai in enumerate(ais)]
+                   + [shared_cache.points(hand, me.wild_ranks)])
+        log_writer.close()
+    if (stats):
+        stats.report()
     pygame.quit()
 
 
@@ -0,0 +1,447 @@
+"""
+Headless rummy core: cards, decks, groups and players without pygame.
+
+A card is a small integer.  The 52 faces are numbered suit-major,
+
+    face = (suit.value - 1) * 13 + (rank.value - 2)
+
+and copy k of a face is face + k * 52, so a double deck is exactly
+range(104).  A table (TableConfig) shuffles 1 to MAX_DECKS decks together,
+and may play their printed jokers too: those are numbered from
+PRINTED_JOKER on and all share the face JOKER_FACE.  Sprites and images are
+attached by the pygame front end (myrummy.py) only for cards that are shown
+on screen.
+"""
+from collections import deque
+from enum import Enum
+import random
+
+import instrument
+
+
+class Suit(Enum):
+    CLUB = 1
+    DIAMOND = 2
+    HEART = 3
+    SPADE = 4
+
+    def __lt__(self, other):
+        if not isinstance(other, Suit):
+            return NotImplemented
+        else:
+            return self.value < other.value
+
+
+class CardRank(Enum):
+    TWO = 2
+    THREE = 3
+    FOUR = 4
+    FIVE = 5
+    SIX = 6
+    SEVEN = 7
+    EIGHT = 8
+    NINE = 9
+    TEN = 10
+    JACK = 11
+    QUEEN = 12
+    KING = 13
+    ACE = 14
+
+    def __lt__(self, other):
+        if not isinstance(other, CardRank):
+            return NotImplemented
+        else:
+            return self.value < other.value
+
+    def __sub__(self, other):
+        if not isinstance(other, CardRank):
+            return NotImplemented
+        else:
+            return self.value - other.value
+
+
+NUM_RANKS = 13
+NUM_FACES = 52
+
+# the meld solver counts a face in 2 bits, so three copies at most
+MAX_DECKS = 3
+JOKERS_PER_DECK = 2
+PRINTED_JOKER = MAX_DECKS * NUM_FACES
+JOKER_FACE = NUM_FACES
+NUM_CARDS = PRINTED_JOKER + MAX_DECKS * JOKERS_PER_DECK
+
+MIN_PLAYERS = 2
+MAX_PLAYERS = 6
+HAND_SIZE = 13
+
+SUITS = tuple(Suit)
+RANKS = tuple(CardRank)
+
+
+def make_card(suit, rank, copy=0):
+    return copy * NUM_FACES + (suit.value - 1) * NUM_RANKS + rank.value - 2
+
+
+def card_face(card):
+    return card % NUM_FACES if card < PRINTED_JOKER else JOKER_FACE
+
+
+def is_printed_joker(card):
+    return card >= PRINTED_JOKER
+
+
+def card_suit(card):
+    return SUITS[card % NUM_FACES // NUM_RANKS]
+
+
+def card_rank(card):
+    return RANKS[card % NUM_RANKS]
+
+
+def card_str(card):
+    if (card >= PRINTED_JOKER):
+        return "JOKER"
+    return card_rank(card).name + "_" + card_suit(card).name
+
+
+def card_filename(card):
+    if (card >= PRINTED_JOKER):
+        return "joker.gif"
+    suit, rank = card_suit(card), card_rank(card)
+    if (rank.value <= 9):
+        return str(rank.value) + suit.name[0].lower() + ".gif"
+    else:
+        return rank.name[0].lower() + suit.name[0].lower() + ".gif"
+
+
+class Deck():
+    # the top of the deck is the right end of the deque, so drawing,
+    # discarding and peeking are all O(1)
+    def __init__(self, name, discards=None, rng=random):
+        self.cards = deque()
+        self.name = name
+        # pile to turn over when this one runs out, and how to shuffle it
+        self.discards = discards
+        self.rng = rng
+
+    def __str__(self):
+        str_val = self.name + "(" + str(len(self.cards)) + "): "
+        for c in reversed(self.cards):
+            str_val = str_val + card_str(c) + " "
+        return str_val
+
+    def __len__(self):
+        return len(self.cards)
+
+    def deck_size(self):
+        return len(self.cards)
+
+    def shuffle_cards(self, rng=None):
+        # deque indexing is O(n) in the middle, so shuffle a list copy
+        cards = list(self.cards)
+        (rng or self.rng).shuffle(cards)
+        self.cards = deque(cards)
+
+    def top_card(self):
+        if (self.cards):
+            return self.cards[-1]
+        return None
+
+    def draw_card(self):
+        if (not self.cards and self.discards is not None):
+            self.refill_from(self.discards)
+        return self.cards.pop()
+
+    def draw_cards(self, n):
+        assert (n > 0)
+        if (len(self.cards) >= n):
+            # dealing: no refill can be needed on the way
+            pop = self.cards.pop
+            return [pop() for i in range(n)]
+        return [self.draw_card() for i in range(n)]
+
+    def add_card(self, card):
+        self.cards.append(card)
+
+    def refill_from(self, discards, rng=None):
+        # take over the discard pile, all but its top card, and shuffle it
+        top = discards.cards.pop()
+        self.cards, discards.cards = discards.cards, deque((top,))
+        self.shuffle_cards(rng)
+
+
+class DoubleDeck(Deck):
+    def __init__(self, name, discards=None, rng=random):
+        Deck.__init__(self, name, discards, rng)
+        self.cards = deque(range(2 * NUM_FACES))
+
+
+class TableConfig():
+    # who sits at a table and what is dealt: 2 to 6 players, 1 to 3 decks
+    # shuffled together, with or without the decks' printed jokers
+    __slots__ = ("players", "decks", "printed_jokers", "hand_size")
+
+    def __init__(self, players=2, decks=2, printed_jokers=False, hand_size=HAND_SIZE):
+        if (not MIN_PLAYERS <= players <= MAX_PLAYERS):
+            raise ValueError("a table seats %d to %d players, not %d" % (MIN_PLAYERS, MAX_PLAYERS, players))
+        if (not 1 <= decks <= MAX_DECKS):
+            raise ValueError("a table plays 1 to %d decks, not %d" % (MAX_DECKS, decks))
+        self.players = players
+        self.decks = decks
+        self.printed_jokers = printed_jokers
+        self.hand_size = hand_size
+        # the hands, the two jokers shown, the open card and one to draw
+        if (players * hand_size + 4 > self.num_cards()):
+            raise ValueError("%d deck(s) are too few for %d hands of %d" % (decks, players, hand_size))
+
+    def __repr__(self):
+        return "TableConfig(players=%d, decks=%d, printed_jokers=%s)" % (
+            self.players, self.decks, self.printed_jokers)
+
+    def num_jokers(self):
+        return self.decks * JOKERS_PER_DECK if self.printed_jokers else 0
+
+    def num_cards(self):
+        return self.decks * NUM_FACES + self.num_jokers()
+
+    def cards(self):
+        cards = list(range(self.decks * NUM_FACES))
+        cards.extend(range(PRINTED_JOKER, PRINTED_JOKER + self.num_jokers()))
+        return cards
+
+    def next_seat(self, seat):
+        return (seat + 1) % self.players
+
+    def others_hold(self):
+        # cards in the other seats' hands, between turns
+        return (self.players - 1) * self.hand_size
+
+
+DEFAULT_TABLE = TableConfig()
+
+
+class TableDeck(Deck):
+    # every card of a table's decks, its printed jokers too
+    def __init__(self, name, config, discards=None, rng=random):
+        Deck.__init__(self, name, discards, rng)
+        self.cards = deque(config.cards())
+
+
+class CGroupType():
+    PURE_SEQ = 1
+    IMPURE_SEQ = 2
+    SET = 3
+    UNKNOWN = 4
+
+
+class CGroupStatus():
+    INCOMPLETE = 1
+    COMPLETE = 2
+
+
+class CGroup():
+    __slots__ = ("cards", "type", "status")
+    maxsize = 4
+
+    def __init__(self, type):
+        self.cards = []
+        self.type = type
+        self.status = CGroupStatus.INCOMPLETE
+
+    def append(self, card):
+        self.cards.append(card)
+
+    def prepend(self, card):
+        self.cards.insert(0, card)
+
+    def __repr__(self):
+        str_val = "["
+        for c in self.cards:
+            str_val += card_str(c) + " "
+        str_val += "]"
+        return str_val
+
+    def size(self):
+        return len(self.cards)
+
+
+class Player():
+    def __init__(self, deck, name, hand_size=HAND_SIZE):
+        self.turn = False
+        self.name = name
+        self.cardgroups = []
+        # get a hand
+        self.cards = deck.draw_cards(hand_size)
+        new_group = CGroup(CGroupType.UNKNOWN)
+        new_group.cards = self.cards
+        self.cardgroups.append(new_group)
+
+    def __str__(self):
+        str_val = self.name + ": "
+        for cg in self.cardgroups:
+            for c in cg.cards:
+                str_val = str_val + card_str(c) + " "
+        return str_val
+
+    def swap_cards(self, ix1, ix2):
+        self.cards[ix1], self.cards[ix2] = self.cards[ix2], self.cards[ix1]
+
+    def watch(self, closedeck, opendeck):
+        # another seat has just played; see Me.watch
+        pass
+
+
+class Me(Player):
+
+    def __init__(self, deck, name, config=DEFAULT_TABLE):
+        Player.__init__(self, deck, name, config.hand_size)
+        self.config = config
+        self.wild_ranks = ()
+        self.jokers = []
+        self.have_pure_seq = False
+        self.partition = None
+
+        # what I know of the cards I cannot see, and where the piles stood
+        # after my last throw, to work out what the opponent did since
+        from tracker import CardTracker
+        self.tracker = CardTracker(config.decks, config.others_hold(), config.num_jokers())
+        for c in self.cards:
+            self.tracker.seen(c)
+        self.watching = False
+        self.last_throw = None
+        self.last_draw = None           # (card, from the open pile)
+        self.open_after_throw = None
+        self.closed_after = None
+
+        # arrange cards by color and number; they are grouped once the
+        # jokers are known (set_jokers)
+        self.cards.sort(key=card_face)
+
+    @staticmethod
+    def can_play(config):
+        # whether this player copes with a table set up like config
+        return True
+
+    def set_jokers(self, jokers):
+        # regroup once the jokers beside the closed deck are known
+        from melds import wild_ranks_of
+        self.wild_ranks = wild_ranks_of(jokers)
+        for c in jokers:
+            self.tracker.seen(c)
+        self.make_groups()
+
+    @instrument.timed("make_groups")
+    def make_groups(self):
+        # split the hand into the melds that leave the least deadwood
+        from handcache import shared_cache
+        part = shared_cache.solve(self.cards, self.wild_ranks)
+        self.cardgroups = []
+        for type, groups in ((CGroupType.PURE_SEQ, part.pure_seqs),
+                             (CGroupType.IMPURE_SEQ, part.impure_seqs),
+                             (CGroupType.SET, part.sets)):
+            for cards in groups:
+                new_group = CGroup(type)
+                new_group.cards = cards
+                new_group.status = CGroupStatus.COMPLETE
+                self.cardgroups.append(new_group)
+        if (part.deadwood):
+            new_group = CGroup(CGroupType.UNKNOWN)
+            new_group.cards = list(part.deadwood)
+            self.cardgroups.append(new_group)
+        self.jokers = part.jokers
+        self.have_pure_seq = part.has_pure_seq()
+        self.partition = part
+
+    def rank_discards(self, cards):
+        # (score, card) for one card of each face, best throw first; the
+        # score is (not valid, points left, -rank) so a declarable hand
+        # wins over any other and high cards go first on equal deadwood
+        from handcache import shared_cache
+        ranked = []
+        tried = set()
+        for i, c in enumerate(cards):
+            face = card_face(c)
+            if (face in tried):
+                continue
+            tried.add(face)
+            points, valid = shared_cache.evaluate(cards[:i] + cards[i + 1:], self.wild_ranks)
+            ranked.append(((not valid, points, -(c % NUM_RANKS)), c))
+        ranked.sort(key=lambda r: r[0])
+        return ranked
+
+    def best_discard(self, cards):
+        # the card to throw that leaves the least deadwood, and the
+        # points left
+        score, card = self.rank_discards(cards)[0]
+        return card, score[1]
+
+    def observe(self, closedeck, opendeck):
+        # the opponent's last turn, from the tops of the two piles; at a
+        # bigger table watch() has seen every turn as it was played
+        if (not self.watching):
+            self._observe(closedeck, opendeck)
+
+    def watch(self, closedeck, opendeck):
+        # at a table of more than two, called before the first turn and
+        # after every other seat's turn.  Each call works out one turn from
+        # the piles, as observe() does for the one opponent of a two-seat
+        # table, and notes where they stand for the next
+        self.watching = True
+        self._observe(closedeck, opendeck)
+        self.last_throw = opendeck.top_card()
+        self.open_after_throw = len(opendeck)
+        self.closed_after = len(closedeck)
+
+    def _observe(self, closedeck, opendeck):
+        t = self.tracker
+        if (self.open_after_throw is None):
+            # my first turn: whatever is on the open pile is news
+            for c in opendeck.cards:
+                t.turned_up(c)
+            return
+        if (len(closedeck) > self.closed_after):
+            # the closed deck ran out and the open pile was turned over
+            t.reshuffled(self.last_throw)
+        elif (len(opendeck) == self.open_after_throw):
+            # the pile did not grow: my throw was picked up
+            t.opp_picked_up(self.last_throw)
+        t.opp_discarded(opendeck.top_card())
+
+    def draw_from(self, closedeck, opendeck, open_pile):
+        if (open_pile):
+            card = opendeck.draw_card()
+            self.tracker.picked_up(card)
+        else:
+            if (not closedeck.cards):
+                self.tracker.reshuffled(opendeck.top_card())
+            card = closedeck.draw_card()
+            self.tracker.seen(card)
+        self.cards.append(card)
+        self.last_draw = (card, open_pile)
+        return card
+
+    def end_turn(self, closedeck, opendeck, throw_card):
+        # throw_card goes on the open pile once take_turn returns
+        self.cards.remove(throw_card)
+        self.cards.sort(key=card_face)
+        self.make_groups()
+        self.tracker.discarded(throw_card)
+        self.last_throw = throw_card
+        self.open_after_throw = len(opendeck) + 1
+        self.closed_after = len(closedeck)
+        return self.partition.valid(), throw_card
+
+    def take_turn(self, closedeck, opendeck, budget=None):
+        # pick up the open card only if it lowers my deadwood; this is
+        # quick enough to ignore the time budget (see aiworker.Budget)
+        self.observe(closedeck, opendeck)
+        open_pile = False
+        top = opendeck.top_card()
+        if (top is not None):
+            throw, points = self.best_discard(self.cards + [top])
+            open_pile = throw != top and points < self.partition.points
+
+        # get new card
+        self.draw_from(closedeck, opendeck, open_pile)
+        throw_card, points = self.best_discard(self.cards)
+        return self.end_turn(closedeck, opendeck, throw_card)
@@ -0,0 +1,128 @@
+"""
+Precomputed runs of one suit, for the meld solver.
+
+Which runs a card can start or sit in depends only on which ranks of its
+suit are in the hand (a run takes one copy of each rank, so the counts do
+not matter) and on how many jokers are free to fill the gaps.  A suit's
+holding is a 14-bit row, bit 0 the ace below TWO and bits 1..13 TWO .. ACE,
+so the ace-low and ace-high runs are both in it.  For every row and every
+place in it, windows() lists the runs through that place, as (low, high,
+jokers needed, check), in the order the solver tries them.
+
+The table covers up to MAX_JOKERS jokers; the solver scans the row itself
+for hands with more.  It is built once (a few seconds), saved beside this
+file and loaded the first time it is used.
+"""
+import os
+import pickle
+
+from rummycore import NUM_RANKS
+
+MAX_MELD = 13
+MAX_JOKERS = 4
+ROW = NUM_RANKS + 1
+TABLE_VERSION = 1
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runtable.pickle")
+
+# check bits: the solver looks at the wild cards before trying these
+EDGE = 1        # a three-card run with a gap below it and above it
+LONELY = 2      # the card and two gaps
+
+_table = None
+
+
+def _compress_table():
+    # 7 ranks' 2-bit counts (even bits set where held) -> a 7-bit mask
+    table = [0] * (1 << 14)
+    for m in range(1 << 7):
+        spread = 0
+        for r in range(7):
+            if (m >> r) & 1:
+                spread |= 1 << (2 * r)
+        table[spread] = m
+    return table
+
+
+_COMPRESS = _compress_table()
+_SUIT_BITS = 2 * NUM_RANKS
+_SUIT_MASK = (1 << _SUIT_BITS) - 1
+_EVEN = int("01" * NUM_RANKS, 2)
+
+
+def suit_row(counts, suit):
+    # the row of suit in a solver count word (2 bits per face)
+    s = (counts >> (_SUIT_BITS * suit)) & _SUIT_MASK
+    present = (s | (s >> 1)) & _EVEN
+    ranks = _COMPRESS[present & 0x3fff] | (_COMPRESS[present >> 14] << 7)
+    return (ranks << 1) | (ranks >> (NUM_RANKS - 1))
+
+
+def scan(row, p, max_jokers=MAX_JOKERS):
+    # the runs through place p of row needing at most max_jokers jokers
+    found = []
+    natural = [(row >> q) & 1 for q in range(ROW)]
+    need_below = 0
+    for a in range(p, -1, -1):
+        if (a < p and not natural[a]):
+            need_below += 1
+            if (need_below > max_jokers):
+                break
+        need = need_below
+        top = NUM_RANKS - 1 if a == 0 else min(NUM_RANKS, a + MAX_MELD - 1)
+        for b in range(p, top + 1):
+            if (b > p and not natural[b]):
+                need += 1
+                if (need > max_jokers):
+                    break
+            n = b - a + 1
+            if (n < 3):
+                continue
+            if (n > 3 and (not natural[a] or not natural[b])):
+                continue
+            check = 0
+            if (n == 3 and not natural[a] and b < top and not natural[b + 1]):
+                check |= EDGE
+            if (need == 2 and all(not natural[q] for q in range(a, b + 1) if q != p)):
+                check |= LONELY
+            found.append((a, b, need, check))
+    return tuple(found)
+
+
+def build():
+    # indexed by (ranks held, TWO .. ACE) * ROW + place; equal entries are
+    # shared, which keeps the saved file small
+    table = []
+    shared = {}
+    for ranks in range(1 << NUM_RANKS):
+        row = (ranks << 1) | (ranks >> (NUM_RANKS - 1))
+        for p in range(ROW):
+            found = tuple(shared.setdefault(w, w) for w in scan(row, p)) if (row >> p) & 1 else ()
+            table.append(shared.setdefault(found, found))
+    return table
+
+
+def load(path=TABLE_FILE):
+    global _table
+    try:
+        with open(path, "rb") as f:
+            version, table = pickle.load(f)
+        if (version == TABLE_VERSION):
+            _table = table
+            return _table
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+    _table = build()
+    try:
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((TABLE_VERSION, _table), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        # a read-only install just builds the table every run
+        pass
+    return _table
+
+
+def windows(row, p):
+    table = _table if _table is not None else load()
+    return table[(row >> 1) * ROW + p]
@@ -0,0 +1,85 @@
+"""
+Batched deadwood scoring with NumPy.
+
+score_hands() takes an (N, 13) or (N, 14) array of encoded cards and the
+wild ranks of each hand, and returns the deadwood points and the "valid
+declare" flag of all N hands at once.
+
+Everything that can be decided per face is done in whole-array passes: card
+values, wild cards (printed jokers among them), and whether a hand could
+hold a pure sequence at all.  A hand without three cards in a row of one
+suit scores all its natural cards, which settles most end-of-game hands
+without solving them.  The rest are reduced to their face counts,
+duplicates are dropped, and each distinct hand is solved once through the
+hand cache.
+"""
+import numpy as np
+
+from rummycore import NUM_FACES, NUM_RANKS, PRINTED_JOKER
+from melds import RANK_POINTS
+from handcache import shared_cache
+
+_RANK_POINTS = np.array(RANK_POINTS, dtype=np.int32)
+
+
+def _wild_mask(ranks, joker_ranks):
+    # joker_ranks is (N,) or (N, k) of rank indices, -1 for no joker
+    joker_ranks = np.asarray(joker_ranks)
+    if (joker_ranks.ndim == 1):
+        joker_ranks = joker_ranks[:, None]
+    return (ranks[:, :, None] == joker_ranks[:, None, :]).any(axis=2), joker_ranks
+
+
+def face_counts(faces, select=None):
+    # (N, 52) counts of each face in each hand, of the selected cards only
+    n = faces.shape[0]
+    flat = (np.arange(n)[:, None] * NUM_FACES + faces).ravel()
+    weights = None if select is None else select.ravel().astype(np.int32)
+    counts = np.bincount(flat, weights=weights, minlength=n * NUM_FACES)
+    return counts.reshape(n, NUM_FACES).astype(np.int8)
+
+
+def pure_seq_possible(present):
+    # (N, 52) bool of faces held -> (N,) bool: three in a row in some suit,
+    # with the ace counted both low and high
+    rows = present.reshape(-1, 4, NUM_RANKS)
+    rows = np.concatenate((rows[:, :, -1:], rows), axis=2)
+    runs = rows[:, :, :-2] & rows[:, :, 1:-1] & rows[:, :, 2:]
+    return runs.any(axis=(1, 2))
+
+
+def score_hands(hands, joker_ranks, cache=shared_cache):
+    hands = np.asarray(hands)
+    printed = hands >= PRINTED_JOKER
+    faces = np.where(printed, 0, hands % NUM_FACES)
+    ranks = faces % NUM_RANKS
+    wild, joker_ranks = _wild_mask(ranks, joker_ranks)
+    wild |= printed
+
+    # points if nothing can be melded
+    points = np.where(wild, 0, _RANK_POINTS[ranks]).sum(axis=1).astype(np.int32)
+    valid = np.zeros(len(hands), dtype=bool)
+
+    # a wild card in its own place still makes a pure sequence, so every
+    # card counts towards the pure test
+    counts = face_counts(faces, ~printed)
+    todo = np.flatnonzero(pure_seq_possible(counts > 0))
+    if (len(todo) == 0):
+        return points, valid
+
+    # solve each distinct (face counts, printed jokers, wild ranks) once
+    jokers = printed[todo].sum(axis=1, dtype=np.int8)[:, None]
+    keys = np.concatenate((counts[todo], jokers, np.sort(joker_ranks[todo], axis=1).astype(np.int8)), axis=1)
+    uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+    upoints = np.empty(len(uniq), dtype=np.int32)
+    uvalid = np.empty(len(uniq), dtype=bool)
+    for i, row in enumerate(uniq):
+        cards = []
+        for copy in range(int(row[:NUM_FACES].max())):
+            cards.extend((np.flatnonzero(row[:NUM_FACES] > copy) + copy * NUM_FACES).tolist())
+        cards.extend(range(PRINTED_JOKER, PRINTED_JOKER + int(row[NUM_FACES])))
+        wild_ranks = tuple(int(r) for r in set(row[NUM_FACES + 1:].tolist()) if r >= 0)
+        upoints[i], uvalid[i] = cache.evaluate(cards, wild_ranks)
+    points[todo] = upoints[inverse.ravel()]
+    valid[todo] = uvalid[inverse.ravel()]
+    return points, valid
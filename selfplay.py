@@ -0,0 +1,217 @@
+"""
+Headless self-play between AI policies.
+
+Each game is dealt from a seeded deck and played to a declare (or a turn
+limit) without pygame, at a table of 2 to 6 seats with 1 to 3 decks (see
+rummycore.TableConfig).  Games are fanned out over a process pool in
+fixed-size chunks; every chunk draws its game seeds from its own RNG stream,
+so the results depend only on the seed, not on the number of workers.
+
+    python selfplay.py -n 1000 -j 4 --policies greedy random
+    python selfplay.py -n 100 --policies greedy greedy greedy random --decks 3 --printed-jokers
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import gamelog
+from ismcts import ISMCTSMe
+from rummycore import DEFAULT_TABLE, Deck, Me, TableConfig, TableDeck
+
+CHUNK = 50
+MAX_TURNS = 300
+
+
+class RandomMe(Me):
+    # draws blind and throws a random card; a baseline for the others
+    def take_turn(self, closedeck, opendeck, budget=None):
+        self.observe(closedeck, opendeck)
+        self.draw_from(closedeck, opendeck, False)
+        return self.end_turn(closedeck, opendeck, self.cards[self.rng.randrange(len(self.cards))])
+
+
+POLICIES = {
+    "greedy": Me,
+    "ismcts": ISMCTSMe,
+    "random": RandomMe,
+}
+
+
+def make_player(policy, closedeck, name, config=DEFAULT_TABLE):
+    # a policy name, or "name:N" for a searching policy given N playouts
+    policy, _, playouts = policy.partition(":")
+    player = POLICIES[policy](closedeck, name, config)
+    if (playouts):
+        player.playouts = int(playouts)
+    return player
+
+
+def check_policy(policy):
+    # for argparse: the policy specs make_player() takes
+    name, _, playouts = policy.partition(":")
+    if (name not in POLICIES):
+        raise argparse.ArgumentTypeError("no policy %r (%s)" % (name, ", ".join(sorted(POLICIES))))
+    if (playouts and not (playouts.isdigit() and hasattr(POLICIES[name], "playouts"))):
+        raise argparse.ArgumentTypeError("%s does not take a number of playouts" % name)
+    return policy
+
+
+class GameResult():
+    def __init__(self, seed, policies, winner, points, turns, log=None, think=None):
+        self.seed = seed
+        self.policies = policies
+        self.winner = winner      # seat that declared, None if no one did
+        self.points = points      # deadwood of each seat at the end
+        self.turns = turns
+        self.log = log            # the game as gamelog records, if asked for
+        self.think = think        # seconds each seat spent in take_turn
+
+
+def play_game(seed, policies, max_turns=MAX_TURNS, record=False, config=None):
+    # one player per policy; a two-deck table unless config says otherwise
+    if (config is None):
+        config = TableConfig(len(policies))
+    if (config.players != len(policies)):
+        raise ValueError("%d policies for a table of %d" % (len(policies), config.players))
+    rng = random.Random(seed)
+    log = gamelog.GameRecord(len(policies)) if record else None
+    opendeck = Deck("od")
+    closedeck = TableDeck("cd", config, opendeck, rng)
+    closedeck.shuffle_cards()
+
+    players = []
+    for seat, name in enumerate(policies):
+        player = make_player(name, closedeck, "%s%d" % (name, seat), config)
+        player.rng = rng
+        players.append(player)
+        if (log):
+            log.deal(seat, player.cards)
+    jokers = closedeck.draw_cards(2)
+    for player in players:
+        player.set_jokers(jokers)
+    opendeck.add_card(closedeck.draw_card())
+    if (log):
+        for c in jokers:
+            log.joker(c)
+        log.turn_up(opendeck.top_card())
+
+    # with more than one opponent, every player is shown every turn
+    watchers = players if len(players) > 2 else ()
+    for player in watchers:
+        player.watch(closedeck, opendeck)
+
+    winner = None
+    turns = 0
+    seat = 0
+    think = [0.0] * len(players)
+    while (turns < max_turns):
+        player = players[seat]
+        turns += 1
+        start = time.perf_counter()
+        done, throw_card = player.take_turn(closedeck, opendeck)
+        think[seat] += time.perf_counter() - start
+        opendeck.add_card(throw_card)
+        if (log):
+            log.draw(seat, *player.last_draw)
+            log.discard(seat, throw_card)
+        if (done):
+            winner = seat
+            if (log):
+                log.declare(winner, True)
+            break
+        for other in watchers:
+            if (other is not player):
+                other.watch(closedeck, opendeck)
+        seat = config.next_seat(seat)
+
+    points = [0 if seat == winner else p.partition.points for seat, p in enumerate(players)]
+    return GameResult(seed, tuple(policies), winner, points, turns,
+                      log.end(winner, points) if log else None, think)
+
+
+def play_chunk(seed, chunk, count, policies, max_turns=MAX_TURNS, record=False, config=None):
+    # one RNG stream per chunk; the seats turn round every game so every
+    # policy gets to go first equally often
+    rng = random.Random("%d/%d" % (seed, chunk))
+    results = []
+    for i in range(count):
+        k = i % len(policies)
+        seats = list(policies[k:]) + list(policies[:k])
+        results.append(play_game(rng.getrandbits(64), seats, max_turns, record, config))
+    return results
+
+
+def run_selfplay(games, policies, workers=None, seed=0, max_turns=MAX_TURNS, log_path=None, config=None):
+    # with log_path, the workers send back each game's records and they are
+    # appended here, in order, so only one process writes the file
+    chunks = []
+    for chunk, start in enumerate(range(0, games, CHUNK)):
+        chunks.append((seed, chunk, min(CHUNK, games - start), tuple(policies), max_turns,
+                       log_path is not None, config))
+    results = []
+    if (workers == 1):
+        for args in chunks:
+            results.extend(play_chunk(*args))
+            if (log_path):
+                gamelog.append_games(log_path, [r.log for r in results[-args[2]:]])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_results in pool.map(play_chunk, *zip(*chunks)):
+                results.extend(chunk_results)
+                if (log_path):
+                    gamelog.append_games(log_path, [r.log for r in chunk_results])
+    return results
+
+
+def summarize(results, policies, elapsed):
+    lines = []
+    n = len(results)
+    lines.append("%d games in %.1f s: %.1f games/s" % (n, elapsed, n / elapsed))
+    for name in sorted(set(policies)):
+        wins = 0
+        seats = 0
+        points = 0
+        for r in results:
+            for seat, p in enumerate(r.policies):
+                if (p == name):
+                    seats += 1
+                    wins += r.winner == seat
+                    points += r.points[seat]
+        lines.append("%-10s win rate %5.1f%%, average points %.1f" % (name, 100.0 * wins / seats, points / seats))
+    undecided = sum(1 for r in results if r.winner is None)
+    turns = sum(r.turns for r in results) / n
+    lines.append("undecided %d, average turns %.1f" % (undecided, turns))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--games", type=int, default=200)
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--policies", nargs="+", default=["greedy", "greedy"], type=check_policy,
+                        help="one per seat, 2 to 6 of %s; ismcts:N searches N playouts a move"
+                        % ", ".join(sorted(POLICIES)))
+    parser.add_argument("--decks", type=int, default=2, help="decks shuffled together, 1 to 3")
+    parser.add_argument("--printed-jokers", action="store_true", help="play the decks' printed jokers too")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--log", metavar="FILE", help="append every game to a binary game log")
+    args = parser.parse_args(argv)
+    try:
+        config = TableConfig(len(args.policies), args.decks, args.printed_jokers)
+    except ValueError as e:
+        parser.error(str(e))
+    for policy in args.policies:
+        if (not POLICIES[policy.partition(":")[0]].can_play(config)):
+            parser.error("%s cannot play %r" % (policy, config))
+
+    start = time.perf_counter()
+    results = run_selfplay(args.games, args.policies, args.workers, args.seed, args.max_turns, args.log,
+                           config)
+    print(summarize(results, args.policies, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Headless multi-table game server.
+
+Every table is a game between a remote player and an AI on the headless
+core: its own seeded DoubleDeck, open pile, AI player and remote hand.
+Clients speak line-delimited JSON over TCP or a Unix socket; one
+connection can run any number of tables, and requests carrying an "id" get
+it back so they can be pipelined.  AI moves run in a process pool (the
+table travels to a worker and back), so a slow search on one table never
+holds up the event loop or the other tables.
+
+Requests ("table" is the id returned by "new"):
+
+    {"op": "new", "seed": 1, "ai": "greedy"}
+    {"op": "draw", "table": 1, "from": "closed"}        or "open"
+    {"op": "discard", "table": 1, "card": 17, "declare": false}
+    {"op": "state", "table": 1}
+    {"op": "close", "table": 1}
+
+The reply to a discard includes the AI's move, or the end of the game.
+
+    python server.py --port 7777
+    python server.py --load-test --tables 200 --clients 20
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from handcache import shared_cache
+from ismcts import ISMCTSMe
+from melds import card_points
+from rummycore import Deck, DoubleDeck, Me, Player
+
+AIS = {
+    "greedy": Me,
+    "ismcts": ISMCTSMe,
+}
+MAX_TURNS = 300
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def ai_move(me, closedeck, opendeck):
+    # runs in a worker; the table's objects come back with the move made
+    done, throw_card = me.take_turn(closedeck, opendeck)
+    return me, closedeck, opendeck, done, throw_card
+
+
+class Table():
+    def __init__(self, id, seed, ai):
+        self.id = id
+        rng = random.Random(seed)
+        self.opendeck = Deck("od", rng=rng)
+        self.closedeck = DoubleDeck("cd", self.opendeck, rng)
+        self.closedeck.shuffle_cards()
+        self.me = AIS[ai](self.closedeck, "ai")
+        self.me.rng = rng
+        self.you = Player(self.closedeck, "you")
+        self.jokers = self.closedeck.draw_cards(2)
+        self.me.set_jokers(self.jokers)
+        self.opendeck.add_card(self.closedeck.draw_card())
+        self.drawn = False
+        self.busy = False           # an AI move is in flight
+        self.winner = None
+        self.turns = 0
+
+    def state(self):
+        return {"table": self.id, "hand": sorted(self.you.cards), "jokers": self.jokers,
+                "open": self.opendeck.top_card(), "closed": len(self.closedeck),
+                "drawn": self.drawn, "turns": self.turns, "winner": self.winner}
+
+    def points(self):
+        return shared_cache.points(self.you.cards, self.me.wild_ranks)
+
+    def draw(self, source):
+        if (self.winner is not None or self.drawn or self.busy):
+            raise ProtocolError("not your turn to draw")
+        if (source == "open"):
+            if (self.opendeck.top_card() is None):
+                raise ProtocolError("the open pile is empty")
+            card = self.opendeck.draw_card()
+        elif (source == "closed"):
+            card = self.closedeck.draw_card()
+        else:
+            raise ProtocolError("draw from 'open' or 'closed'")
+        self.you.cards.append(card)
+        self.drawn = True
+        return card
+
+    def discard(self, card, declare):
+        if (self.winner is not None or not self.drawn or self.busy):
+            raise ProtocolError("not your turn to discard")
+        if (card not in self.you.cards):
+            raise ProtocolError("card %r is not in your hand" % (card,))
+        self.you.cards.remove(card)
+        self.opendeck.add_card(card)
+        self.drawn = False
+        self.turns += 1
+        if (declare):
+            # a wrong declare loses the game
+            valid = shared_cache.evaluate(self.you.cards, self.me.wild_ranks)[1]
+            self.winner = "you" if valid else "ai"
+        elif (self.turns >= MAX_TURNS):
+            self.winner = "nobody"
+
+
+class GameServer():
+    def __init__(self, executor):
+        self.executor = executor
+        self.tables = {}
+        self.ids = itertools.count(1)
+        self.connections = set()
+
+    async def handle(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        try:
+            while (True):
+                line = await reader.readline()
+                if (not line):
+                    break
+                task = asyncio.ensure_future(self.answer(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if (tasks):
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+            self.connections.discard(connection)
+
+    async def answer(self, line, writer, lock):
+        reply = {}
+        try:
+            request = json.loads(line)
+            if ("id" in request):
+                reply["id"] = request["id"]
+            reply.update(await self.dispatch(request))
+        except (ValueError, KeyError, TypeError, ProtocolError) as e:
+            reply["op"] = "error"
+            reply["message"] = str(e)
+        async with lock:
+            writer.write((json.dumps(reply) + "\n").encode("utf-8"))
+            await writer.drain()
+
+    def table(self, request):
+        table = self.tables.get(request["table"])
+        if (table is None):
+            raise ProtocolError("no table %r" % (request["table"],))
+        return table
+
+    async def dispatch(self, request):
+        op = request["op"]
+        if (op == "new"):
+            ai = request.get("ai", "greedy")
+            if (ai not in AIS):
+                raise ProtocolError("unknown ai %r" % (ai,))
+            id = next(self.ids)
+            seed = request.get("seed", random.getrandbits(64))
+            table = self.tables[id] = Table(id, seed, ai)
+            reply = table.state()
+            reply["op"] = "table"
+            return reply
+        if (op == "draw"):
+            card = self.table(request).draw(request["from"])
+            return {"op": "drew", "card": card}
+        if (op == "discard"):
+            return await self.discard(self.table(request), request["card"], request.get("declare", False))
+        if (op == "state"):
+            reply = self.table(request).state()
+            reply["op"] = "state"
+            return reply
+        if (op == "close"):
+            self.tables.pop(request["table"], None)
+            return {"op": "closed"}
+        raise ProtocolError("unknown op %r" % (op,))
+
+    async def discard(self, table, card, declare):
+        table.discard(card, declare)
+        if (table.winner is not None):
+            return {"op": "over", "winner": table.winner, "points": table.points()}
+
+        # the AI's turn, off the event loop
+        table.busy = True
+        try:
+            top = table.opendeck.top_card()
+            loop = asyncio.get_running_loop()
+            me, closedeck, opendeck, done, throw_card = await loop.run_in_executor(
+                self.executor, ai_move, table.me, table.closedeck, table.opendeck)
+        finally:
+            table.busy = False
+        table.me, table.closedeck, table.opendeck = me, closedeck, opendeck
+        table.opendeck.add_card(throw_card)
+        took, from_open = me.last_draw
+        reply = {"op": "ai", "drew": "open" if from_open else "closed",
+                 "took": took if from_open and took == top else None,
+                 "threw": throw_card, "open": throw_card}
+        if (done):
+            table.winner = "ai"
+            reply["op"] = "over"
+            reply["winner"] = "ai"
+            reply["points"] = table.points()
+        return reply
+
+
+def make_executor(workers):
+    # workers == 0 runs AI moves on threads in this process
+    if (workers == 0):
+        return ThreadPoolExecutor(max_workers=4)
+    # forked workers would inherit the connections' sockets and keep them
+    # open after the server closes them
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def serve(host, port, unix, workers):
+    game = GameServer(make_executor(workers))
+    if (unix):
+        server = await asyncio.start_unix_server(game.handle, path=unix)
+        print("serving on", unix)
+    else:
+        server = await asyncio.start_server(game.handle, host, port)
+        print("serving on %s:%d" % (host, port))
+    async with server:
+        await server.serve_forever()
+
+
+class Client():
+    # a scripted player: draws blind and throws its highest card
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = []
+
+    async def call(self, **request):
+        start = time.perf_counter()
+        self.writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await self.writer.drain()
+        reply = json.loads(await self.reader.readline())
+        self.latencies.append((request["op"], time.perf_counter() - start))
+        if (reply["op"] == "error"):
+            raise ProtocolError(reply["message"])
+        return reply
+
+    async def play(self, seed, ai, max_turns):
+        table = await self.call(op="new", seed=seed, ai=ai)
+        id = table["table"]
+        hand = table["hand"]
+        for turn in range(max_turns):
+            hand.append((await self.call(op="draw", table=id, **{"from": "closed"}))["card"])
+            card = max(hand, key=card_points)
+            hand.remove(card)
+            reply = await self.call(op="discard", table=id, card=card)
+            if (reply["op"] == "over"):
+                break
+        await self.call(op="close", table=id)
+
+
+async def load_test(args):
+    # a server and its clients in one event loop, over a Unix socket
+    path = os.path.join(tempfile.mkdtemp(), "rummy.sock")
+    game = GameServer(make_executor(args.workers))
+    server = await asyncio.start_unix_server(game.handle, path=path)
+    seeds = iter(range(args.tables))
+
+    async def client_task():
+        reader, writer = await asyncio.open_unix_connection(path)
+        client = Client(reader, writer)
+        for seed in seeds:
+            await client.play(seed, args.ai, args.turns)
+        writer.close()
+        await writer.wait_closed()
+        return client.latencies
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client_task() for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    server.close()
+    await asyncio.gather(*game.connections)
+    await server.wait_closed()
+    game.executor.shutdown()
+    os.unlink(path)
+
+    moves = sorted(t for latencies in results for op, t in latencies if op == "discard")
+    requests = sorted(t for latencies in results for op, t in latencies)
+    print("%d tables, %d clients, %s AI, %d workers" % (args.tables, args.clients, args.ai, args.workers))
+    print("%.1f s: %.1f tables/s, %.0f moves/s" % (elapsed, args.tables / elapsed, len(moves) / elapsed))
+    print("move latency (with the AI reply): p50 %.1f ms, p99 %.1f ms" % (
+        moves[len(moves) // 2] * 1000, moves[len(moves) * 99 // 100] * 1000))
+    print("all requests: p50 %.1f ms, p99 %.1f ms" % (
+        requests[len(requests) // 2] * 1000, requests[len(requests) * 99 // 100] * 1000))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(),
+                        help="AI processes; 0 runs them on threads")
+    parser.add_argument("--load-test", action="store_true",
+                        help="play scripted clients against an in-process server")
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=30, help="turns per table in the load test")
+    parser.add_argument("--ai", choices=sorted(AIS), default="greedy")
+    args = parser.parse_args(argv)
+
+    if (args.load_test):
+        asyncio.run(load_test(args))
+    else:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers))
+
+
+if __name__ == "__main__":
+    main()
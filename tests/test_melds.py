@@ -0,0 +1,156 @@
+"""
+solve_hand() against a brute force over every way of laying out a hand.
+
+The brute force knows only the rules: a set is 3 or 4 cards of one rank in
+different suits, a run is 3 or more places of one suit in a row (the ace
+low or high), a joker fills any place, and a run is pure when every card
+sits in its own place.  Like the solver, every meld is built around a
+natural card.  Jokers score nothing; a hand without a pure sequence melds
+nothing.
+"""
+import itertools
+import os
+import random
+import sys
+from functools import lru_cache
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from melds import RANK_POINTS, solve_hand
+from rummycore import NUM_FACES, NUM_RANKS, PRINTED_JOKER, TableConfig, card_face
+
+INF = float("inf")
+
+
+def _place_face(suit, q):
+    # run place 0 is the low ace, 1..13 are TWO .. ACE
+    return suit * NUM_RANKS + (NUM_RANKS - 1 if q == 0 else q - 1)
+
+
+def brute_force(cards, wild_ranks):
+    # (least deadwood with a pure sequence, least with a pure and a second
+    # sequence); INF where there is no such layout
+    wild = set(wild_ranks)
+
+    def joker(c):
+        return c >= PRINTED_JOKER or c % NUM_RANKS in wild
+
+    def points(c):
+        return 0 if joker(c) else RANK_POINTS[c % NUM_RANKS]
+
+    def melds(rest):
+        # every meld holding rest[0], the lowest natural left, as
+        # (cards, is_run, is_pure)
+        c = rest[0]
+        others = rest[1:]
+        jokers = [x for x in others if joker(x)]
+        suit, rank = divmod(card_face(c), NUM_RANKS)
+        mates = [x for x in others if not joker(x) and x % NUM_RANKS == rank
+                 and card_face(x) // NUM_RANKS != suit]
+        for n in range(0, 4):
+            for picked in itertools.combinations(mates, n):
+                if (len(set(card_face(x) for x in picked)) < n):
+                    continue
+                for k in range(0, 4 - n):
+                    if (3 <= 1 + n + k <= 4):
+                        for used in itertools.combinations(jokers, k):
+                            yield (c,) + picked + used, False, False
+        places = (0, NUM_RANKS) if rank == NUM_RANKS - 1 else (rank + 1,)
+        for p in places:
+            for a in range(0, p + 1):
+                for b in range(max(p, a + 2), NUM_RANKS + 1):
+                    slots = []
+                    for q in range(a, b + 1):
+                        if (q == p):
+                            continue
+                        f = _place_face(suit, q)
+                        fits = [x for x in others if card_face(x) == f]
+                        fits += [x for x in jokers if card_face(x) != f]
+                        slots.append(fits)
+                    for fill in itertools.product(*slots):
+                        if (len(set(fill)) < len(fill)):
+                            continue
+                        pure = all(card_face(x) == _place_face(suit, q)
+                                   for x, q in zip(fill, [q for q in range(a, b + 1) if q != p]))
+                        yield (c,) + fill, True, pure
+
+    @lru_cache(maxsize=None)
+    def best(rest, pure, seqs, want_seqs):
+        if (not any(not joker(x) for x in rest)):
+            return 0 if pure and seqs >= want_seqs else INF
+        c = rest[0]
+        result = best(rest[1:], pure, seqs, want_seqs) + points(c)
+        for group, is_run, is_pure in melds(rest):
+            left = list(rest)
+            for x in group:
+                left.remove(x)
+            cost = best(tuple(left), pure or is_pure, min(seqs + is_run, 2), want_seqs)
+            result = min(result, cost)
+        return result
+
+    # naturals first, lowest face first, so rest[0] is always the card to place
+    hand = tuple(sorted(cards, key=lambda x: (joker(x), card_face(x), x)))
+    return best(hand, False, 0, 1), best(hand, False, 0, 2)
+
+
+def check(cards, wild_ranks):
+    part = solve_hand(cards, wild_ranks)
+    with_pure, declarable = brute_force(cards, wild_ranks)
+    groups = part.pure_seqs + part.impure_seqs + part.sets + [part.deadwood]
+    assert sorted(c for g in groups for c in g) == sorted(cards)
+    if (with_pure == INF):
+        assert not part.pure_seqs
+        assert part.points == sum(RANK_POINTS[c % NUM_RANKS] for c in cards
+                                  if c < PRINTED_JOKER and c % NUM_RANKS not in wild_ranks)
+    else:
+        assert part.points == with_pure
+    assert part.valid() == (declarable == 0)
+
+
+def random_hands(seed, n, config, wild=True):
+    rng = random.Random(seed)
+    for i in range(n):
+        cards = config.cards()
+        rng.shuffle(cards)
+        size = rng.choice((7, 10, 13, 14))
+        wild_ranks = tuple(sorted(set(rng.sample(range(NUM_RANKS), rng.choice((1, 2)))))) if wild else ()
+        yield cards[:size], wild_ranks
+
+
+def test_random_hands_without_jokers():
+    for cards, wild_ranks in random_hands(1, 150, TableConfig(), wild=False):
+        check(cards, wild_ranks)
+
+
+def test_random_hands_with_wild_ranks():
+    for cards, wild_ranks in random_hands(2, 150, TableConfig()):
+        check(cards, wild_ranks)
+
+
+def test_random_hands_with_printed_jokers():
+    for cards, wild_ranks in random_hands(3, 150, TableConfig(2, 3, True)):
+        check(cards, wild_ranks)
+
+
+def test_hands_full_of_jokers():
+    # few naturals, many jokers: every run and set has to be filled
+    rng = random.Random(4)
+    config = TableConfig(2, 3, True)
+    for i in range(100):
+        wild_ranks = (rng.randrange(NUM_RANKS),)
+        cards = config.cards()
+        jokers = [c for c in cards if c >= PRINTED_JOKER or c % NUM_RANKS in wild_ranks]
+        naturals = [c for c in cards if c not in jokers]
+        hand = rng.sample(jokers, rng.randint(2, 5)) + rng.sample(naturals, 8)
+        check(hand, wild_ranks)
+
+
+def test_declarable_hand():
+    # 2-3-4 of hearts pure, 5-6-7 of spades with a wild 9 of clubs, and a
+    # set of kings: all melded on two sequences
+    def c(face, copy=0):
+        return face + copy * NUM_FACES
+    hand = [c(13), c(14), c(15), c(42), c(43), c(44), c(7), c(11), c(24), c(37), c(50)]
+    part = solve_hand(hand, (7,))
+    assert part.points == 0
+    assert part.valid()
@@ -0,0 +1,156 @@
+"""
+Round-robin tournament between AI policies, with Elo ratings.
+
+Every pair of policies plays the same deals twice, once from each seat
+(duplicate deals), so a lucky hand is dealt to both sides and most of the
+luck cancels out.  The deals are the same for every pair.  Games run on a
+process pool in chunks of deals, like selfplay.py.
+
+Ratings are a Bradley-Terry fit of all the games (a game nobody declared
+counts as a draw), scaled to Elo with the mean at 0.  The confidence
+intervals come from resampling the deals.  The time column is the mean
+time a policy spends on one move, so strength can be weighed against cost.
+
+    python tournament.py --policies greedy ismcts:50 ismcts:200 random -n 200
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from selfplay import MAX_TURNS, check_policy, play_game
+
+CHUNK = 10
+BOOTSTRAP = 200
+
+
+def deal_seed(seed, deal):
+    # deal i of a tournament, whatever the pairs and workers
+    return random.Random("%d/deal/%d" % (seed, deal)).getrandbits(64)
+
+
+def play_deals(seed, deals, pairs, max_turns):
+    # both seatings of every pair on each deal: (deal, a, b, score of a,
+    # moves and think time of a and of b) per game
+    games = []
+    for deal in deals:
+        game_seed = deal_seed(seed, deal)
+        for a, b in pairs:
+            for seats in ((a, b), (b, a)):
+                r = play_game(game_seed, seats, max_turns)
+                if (r.winner is None):
+                    score = 0.5
+                else:
+                    score = 1.0 if seats[r.winner] == a else 0.0
+                i, j = (0, 1) if seats[0] == a else (1, 0)
+                # seat 0 moves first, so it makes the odd move out
+                moves = ((r.turns + 1) // 2, r.turns // 2)
+                games.append((deal, a, b, score, moves[i], r.think[i], moves[j], r.think[j]))
+    return games
+
+
+def bradley_terry(scores, games, iterations=200):
+    # scores[i, j]: points i took from j; games[i, j]: games between them.
+    # One virtual draw between every pair keeps a policy that never won
+    # (or never lost) at a finite rating.  Returns Elo, mean 0.
+    n = len(scores)
+    prior = 1.0 - np.eye(n)
+    w = (scores + 0.5 * prior).sum(axis=1)
+    g = games + prior
+    p = np.ones(n)
+    for it in range(iterations):
+        denom = (g / (p[:, None] + p[None, :])).sum(axis=1)
+        p = w / denom
+        p /= np.exp(np.log(p).mean())
+    elo = 400.0 * np.log10(p)
+    return elo - elo.mean()
+
+
+def ratings(games, policies, deals, samples=BOOTSTRAP, seed=0):
+    # Elo per policy and a 95% interval from resampling deals
+    index = {name: i for i, name in enumerate(policies)}
+    n = len(policies)
+    # per deal, so the bootstrap can draw whole deals
+    scores = np.zeros((deals, n, n))
+    counts = np.zeros((deals, n, n))
+    for deal, a, b, score, *rest in games:
+        i, j = index[a], index[b]
+        scores[deal, i, j] += score
+        scores[deal, j, i] += 1.0 - score
+        counts[deal, i, j] += 1
+        counts[deal, j, i] += 1
+    elo = bradley_terry(scores.sum(axis=0), counts.sum(axis=0))
+    rng = np.random.default_rng(seed)
+    boot = np.empty((samples, n))
+    for s in range(samples):
+        pick = rng.integers(0, deals, deals)
+        boot[s] = bradley_terry(scores[pick].sum(axis=0), counts[pick].sum(axis=0))
+    low, high = np.percentile(boot, [2.5, 97.5], axis=0)
+    return elo, low, high
+
+
+def run_tournament(policies, deals, workers=None, seed=0, max_turns=MAX_TURNS):
+    pairs = list(itertools.combinations(policies, 2))
+    chunks = [range(start, min(start + CHUNK, deals)) for start in range(0, deals, CHUNK)]
+    games = []
+    if (workers == 1):
+        for chunk in chunks:
+            games.extend(play_deals(seed, chunk, pairs, max_turns))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_games in pool.map(play_deals, itertools.repeat(seed), chunks,
+                                        itertools.repeat(pairs), itertools.repeat(max_turns)):
+                games.extend(chunk_games)
+    return games
+
+
+def table(games, policies, deals, seed=0):
+    elo, low, high = ratings(games, policies, deals, seed=seed)
+    moves = dict.fromkeys(policies, 0)
+    think = dict.fromkeys(policies, 0.0)
+    points = dict.fromkeys(policies, 0.0)
+    played = dict.fromkeys(policies, 0)
+    for deal, a, b, score, moves_a, think_a, moves_b, think_b in games:
+        moves[a] += moves_a
+        think[a] += think_a
+        moves[b] += moves_b
+        think[b] += think_b
+        points[a] += score
+        points[b] += 1.0 - score
+        played[a] += 1
+        played[b] += 1
+    lines = ["%-14s %6s %15s %7s %9s" % ("policy", "elo", "95% interval", "score", "ms/move")]
+    for i in np.argsort(-elo):
+        name = policies[i]
+        lines.append("%-14s %+6.0f %+7.0f..%+5.0f %6.1f%% %9.2f" % (
+            name, elo[i], low[i], high[i], 100.0 * points[name] / played[name],
+            1000.0 * think[name] / max(moves[name], 1)))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--policies", nargs="+", type=check_policy, default=["greedy", "random"],
+                        help="policy names; ismcts:N searches N playouts a move")
+    parser.add_argument("-n", "--deals", type=int, default=100,
+                        help="deals per pair; each is played from both seats")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    args = parser.parse_args(argv)
+    if (len(set(args.policies)) != len(args.policies) or len(args.policies) < 2):
+        parser.error("give at least two different policies")
+
+    start = time.perf_counter()
+    games = run_tournament(args.policies, args.deals, args.workers, args.seed, args.max_turns)
+    elapsed = time.perf_counter() - start
+    print("%d games (%d deals, both seats) in %.1f s" % (len(games), args.deals, elapsed))
+    print(table(games, args.policies, args.deals, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+What a player knows about the cards it cannot see.
+
+CardTracker counts, per face, the copies whose place the player does not
+know (in the closed deck or the opponent's hand), the copies the opponent
+is known to hold because it picked them up from the open pile, and the
+copies lying in the open pile.  At a table of more than two, "the
+opponent" is every other seat together.  The printed jokers, if the table
+plays them, are one more face (JOKER_FACE).  Every event in the game
+changes one or two counts; turning the open pile over into a new closed
+deck changes at most 53.  Nothing is recomputed from the history of the
+game.
+
+The counts are never more than a few, so they are kept in bytearrays: a
+tracker is a few hundred bytes however many games are alive at once.
+"""
+from rummycore import JOKER_FACE, NUM_FACES, PRINTED_JOKER, card_face
+
+NUM_SLOTS = NUM_FACES + 1
+
+
+def _card(face, copy):
+    # a card id for a copy of face
+    if (face == JOKER_FACE):
+        return PRINTED_JOKER + copy
+    return face + copy * NUM_FACES
+
+
+class CardTracker():
+    __slots__ = ("unseen", "opp_known", "open", "num_unseen", "num_known", "opp_size")
+
+    def __init__(self, copies=2, opp_size=13, jokers=0):
+        self.unseen = bytearray([copies]) * NUM_FACES + bytearray([jokers])
+        self.opp_known = bytearray(NUM_SLOTS)
+        self.open = bytearray(NUM_SLOTS)
+        self.num_unseen = copies * NUM_FACES + jokers
+        self.num_known = 0
+        self.opp_size = opp_size
+
+    def seen(self, card):
+        # a card turned up: drawn by me or shown beside the closed deck
+        self.unseen[card_face(card)] -= 1
+        self.num_unseen -= 1
+
+    def turned_up(self, card):
+        # a card I had not seen is lying on the open pile
+        self.seen(card)
+        self.open[card_face(card)] += 1
+
+    def discarded(self, card):
+        # I threw a card onto the open pile
+        self.open[card_face(card)] += 1
+
+    def picked_up(self, card):
+        # I took the open card
+        self.open[card_face(card)] -= 1
+
+    def opp_picked_up(self, card):
+        face = card_face(card)
+        self.open[face] -= 1
+        self.opp_known[face] += 1
+        self.num_known += 1
+
+    def opp_discarded(self, card):
+        # the card came out of the opponent's hand: either one I knew it
+        # had, or one I had not seen
+        face = card_face(card)
+        self.open[face] += 1
+        if (self.opp_known[face]):
+            self.opp_known[face] -= 1
+            self.num_known -= 1
+        else:
+            self.unseen[face] -= 1
+            self.num_unseen -= 1
+
+    def reshuffled(self, top):
+        # the open pile but its top card became the closed deck
+        for face in range(NUM_SLOTS):
+            n = self.open[face]
+            if (n):
+                self.unseen[face] += n
+                self.num_unseen += n
+                self.open[face] = 0
+        self.unseen[card_face(top)] -= 1
+        self.num_unseen -= 1
+        self.open[card_face(top)] = 1
+
+    def p_opp_holds(self, face):
+        # chance the opponent holds at least one copy of face; each unseen
+        # copy is in its hand with probability (unknown slots / unseen)
+        if (self.opp_known[face]):
+            return 1.0
+        n = self.num_unseen
+        slots = self.opp_size - self.num_known
+        u = self.unseen[face]
+        if (u == 0 or n == 0 or slots <= 0):
+            return 0.0
+        # 1 - P(no copy among the opponent's unknown cards)
+        p_none = 1.0
+        for i in range(u):
+            p_none *= (n - slots - i) / (n - i)
+        return 1.0 - max(p_none, 0.0)
+
+    def unseen_cards(self):
+        # one card id per unseen copy; the copy number is made up, only the
+        # face matters to the solver
+        cards = []
+        for face in range(NUM_SLOTS):
+            for copy in range(self.unseen[face]):
+                cards.append(_card(face, copy))
+        return cards
+
+    def known_cards(self):
+        cards = []
+        for face in range(NUM_SLOTS):
+            for copy in range(self.opp_known[face]):
+                cards.append(_card(face, copy))
+        return cards